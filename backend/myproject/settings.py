@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -173,6 +174,21 @@ else:
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 
+# Caches: per-process default plus an optional shared tier (e.g. Redis)
+# used by the cross-worker result caches in quiz.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+shared_cache_url = os.getenv("SHARED_CACHE_URL")
+if shared_cache_url:
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": shared_cache_url,
+    }
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -182,6 +198,23 @@ REST_FRAMEWORK = {
     )
 }
 
+# Password hashing: the first hasher is used for new hashes; logins with an
+# older algorithm are rehashed transparently. Argon2 needs argon2-cffi.
+_hashers = {
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+    "bcrypt": "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+}
+preferred_hasher = os.getenv("DJANGO_PASSWORD_HASHER", "argon2").strip().lower()
+if preferred_hasher not in _hashers:
+    preferred_hasher = "argon2"
+if preferred_hasher == "argon2" and importlib.util.find_spec("argon2") is None:
+    preferred_hasher = "pbkdf2"
+PASSWORD_HASHERS = [_hashers[preferred_hasher]] + [
+    path for name, path in _hashers.items() if name != preferred_hasher
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -26,6 +26,8 @@ urlpatterns = [
     path("quiz/recommend/", views.recommend, name="quiz_recommend"),
 
     path("segment/", views.upload_and_segment, name="segment"),
+    path("api/segment_jobs/", views.submit_segment_job, name="submit_segment_job"),
+    path("api/segment_jobs/<str:job_id>/", views.segment_job_status, name="segment_job_status"),
 
     # API endpoints
     path("api/get_generated_images/", views.get_generated_images, name="get_generated_images"),
@@ -36,7 +38,10 @@ urlpatterns = [
     path("api/generate_instant_vibe/", views.generate_instant_vibe, name="generate_instant_vibe"),
     path("quiz/generate/", views.generate_outfits, name="quiz_generate"),
     path("api/save_image/", views.save_image, name="save_image"),
+    path("api/save_images/", views.save_images, name="save_images"),
     path("api/get_wardrobe/", views.get_wardrobe, name="get_wardrobe"),
     path("api/delete_wardrobe_item/", views.delete_wardrobe_item, name="delete_wardrobe_item"),
+    path("api/delete_wardrobe_items/", views.delete_wardrobe_items, name="delete_wardrobe_items"),
+    path("api/similar_outfits/", views.similar_outfits, name="similar_outfits"),
     path("api/weather_status/", views.weather_status, name="weather_status"),
 ]
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import wraps
+
+from django.http import JsonResponse
+
+# --- Admission control for expensive endpoints ---
+# Every client (JWT user_id, else remote address) gets a token bucket per
+# endpoint, and each endpoint has a cap on requests in flight. Buckets and caps
+# live in this process: with N workers a client's effective quota is N times
+# the configured rate. Background work (recommend's `generate` thread) is only
+# admitted while the expensive endpoints have spare capacity, so it is the
+# first thing shed under load.
+ADMISSION_MAX_CLIENTS = 10000
+ADMISSION_BACKGROUND_SLOTS = int(os.getenv("ADMISSION_BACKGROUND_SLOTS", "2"))
+ADMISSION_SHED_RATIO = float(os.getenv("ADMISSION_SHED_RATIO", "0.5"))
+
+
+@dataclass(frozen=True)
+class Policy:
+    per_minute: float
+    burst: int
+    concurrency: int
+
+
+def _policy(name: str, per_minute: float, burst: int, concurrency: int) -> Policy:
+    prefix = f"ADMISSION_{name.upper()}"
+    return Policy(
+        per_minute=float(os.getenv(f"{prefix}_PER_MINUTE", per_minute)),
+        burst=int(os.getenv(f"{prefix}_BURST", burst)),
+        concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+    )
+
+
+ADMISSION_POLICIES = {
+    "generate": _policy("generate", per_minute=6, burst=3, concurrency=4),
+    "instant_vibe": _policy("instant_vibe", per_minute=1, burst=1, concurrency=1),
+    "segment": _policy("segment", per_minute=10, burst=4, concurrency=2),
+}
+
+
+class AdmissionController:
+    def __init__(self, identify, policies: dict[str, Policy] = ADMISSION_POLICIES,
+                 background_slots: int = ADMISSION_BACKGROUND_SLOTS, shed_ratio: float = ADMISSION_SHED_RATIO):
+        self.identify = identify
+        self.policies = policies
+        self.background_slots = background_slots
+        self.shed_ratio = shed_ratio
+        self._buckets: dict[tuple, tuple[float, float]] = {}  # (endpoint, client) -> (tokens, updated_at)
+        self._in_flight = {name: 0 for name in policies}
+        self._background = 0
+        self._lock = threading.Lock()
+
+    def _take_token(self, endpoint: str, client: str, policy: Policy, now: float) -> float:
+        """0 when a token was taken, else seconds until the next one."""
+        rate = policy.per_minute / 60.0
+        key = (endpoint, client)
+        tokens, updated_at = self._buckets.get(key, (policy.burst, now))
+        tokens = min(policy.burst, tokens + (now - updated_at) * rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate if rate else 60.0
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > ADMISSION_MAX_CLIENTS:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float) -> None:
+        # Buckets that have refilled completely carry no state worth keeping
+        for (endpoint, client), (tokens, updated_at) in list(self._buckets.items()):
+            policy = self.policies[endpoint]
+            if tokens + (now - updated_at) * policy.per_minute / 60.0 >= policy.burst:
+                del self._buckets[(endpoint, client)]
+
+    def admit(self, endpoint: str, client: str) -> JsonResponse | None:
+        """None when admitted (release() must follow), else the 429/503 response to return."""
+        policy = self.policies[endpoint]
+        with self._lock:
+            if self._in_flight[endpoint] >= policy.concurrency:
+                response = JsonResponse({"error": "Server busy, please retry."}, status=503)
+                response["Retry-After"] = "2"
+                return response
+            wait = self._take_token(endpoint, client, policy, time.monotonic())
+            if wait:
+                response = JsonResponse({"error": "Too many requests, slow down."}, status=429)
+                response["Retry-After"] = str(max(int(wait + 0.999), 1))
+                return response
+            self._in_flight[endpoint] += 1
+        return None
+
+    def release(self, endpoint: str) -> None:
+        with self._lock:
+            self._in_flight[endpoint] -= 1
+
+    def limit(self, endpoint: str):
+        """View decorator applying `endpoint`'s policy to the caller."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                rejected = self.admit(endpoint, self.identify(request))
+                if rejected is not None:
+                    print(f"[DEBUG] Admission rejected {endpoint} with {rejected.status_code}")
+                    return rejected
+                try:
+                    return view(request, *args, **kwargs)
+                finally:
+                    self.release(endpoint)
+            return wrapper
+        return decorator
+
+    def overloaded(self) -> bool:
+        with self._lock:
+            return any(
+                self._in_flight[name] >= max(policy.concurrency * self.shed_ratio, 1)
+                for name, policy in self.policies.items()
+            )
+
+    def run_background(self, fn, *args) -> bool:
+        """Start `fn` on a daemon thread unless the server is loaded; False when the work was shed."""
+        if self.overloaded():
+            return False
+        with self._lock:
+            if self._background >= self.background_slots:
+                return False
+            self._background += 1
+
+        def _run():
+            try:
+                fn(*args)
+            finally:
+                with self._lock:
+                    self._background -= 1
+
+        threading.Thread(target=_run, daemon=True).start()
+        return True
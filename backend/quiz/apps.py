@@ -0,0 +1,31 @@
+import os
+import sys
+
+from django.apps import AppConfig
+
+# Server processes that should run the background tasks (see views.start_background_tasks).
+# QUIZ_BACKGROUND_TASKS=1 / 0 forces them on or off, e.g. for a custom server.
+SERVER_PROGRAMS = ("gunicorn", "uvicorn", "daphne", "uwsgi")
+
+
+def _serving() -> bool:
+    override = os.getenv("QUIZ_BACKGROUND_TASKS")
+    if override is not None:
+        return override.strip().lower() in {"1", "true", "yes", "on"}
+    program = os.path.basename(sys.argv[0]) if sys.argv else ""
+    if any(server in program for server in SERVER_PROGRAMS):
+        return True
+    # runserver: only the reloaded child process actually serves requests
+    if len(sys.argv) > 1 and sys.argv[1] == "runserver":
+        return os.environ.get("RUN_MAIN") == "true" or "--noreload" in sys.argv
+    return False
+
+
+class QuizConfig(AppConfig):
+    name = "quiz"
+
+    def ready(self):
+        if _serving():
+            from .views import start_background_tasks
+
+            start_background_tasks()
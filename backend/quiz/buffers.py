@@ -0,0 +1,61 @@
+import binascii
+import io
+
+# --- Zero-copy image buffers ---
+# Generated images are wrapped once in a memoryview. The uploader, the
+# embedding index and the streaming response all read from that same buffer
+# instead of holding their own bytes / BytesIO / base64 copies.
+B64_CHUNK_BYTES = 48 * 1024  # multiple of 3, so chunks encode without padding
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file object over a memoryview (boto3 and PIL accept it)."""
+
+    def __init__(self, view: memoryview):
+        super().__init__()
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        size = min(len(target), len(self._view) - self._pos)
+        if size <= 0:
+            return 0
+        target[:size] = self._view[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(base + offset, 0)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def as_reader(data) -> BufferReader:
+    return BufferReader(data if isinstance(data, memoryview) else memoryview(data))
+
+
+class ImageBuffer:
+    __slots__ = ("view",)
+
+    def __init__(self, data):
+        self.view = data if isinstance(data, memoryview) else memoryview(data)
+
+    def __len__(self) -> int:
+        return self.view.nbytes
+
+    def reader(self) -> BufferReader:
+        return BufferReader(self.view)
+
+    def base64_chunks(self, chunk_bytes: int = B64_CHUNK_BYTES):
+        """Base64 of the buffer, one bounded chunk at a time (slices of the view, never a full copy)."""
+        for start in range(0, len(self.view), chunk_bytes):
+            yield binascii.b2a_base64(self.view[start:start + chunk_bytes], newline=False)
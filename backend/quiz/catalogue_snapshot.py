@@ -0,0 +1,264 @@
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from django.conf import settings
+
+from .read_models import CATALOGUE_PROJECTION, CatalogueItem, catalogue_items, raw
+from .sampling import MIN_RECENCY_WEIGHT, RECENCY_HALF_LIFE_DAYS
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX dev machines build without the lock
+    fcntl = None
+
+# --- Memory-mapped catalogue snapshot ---
+# One process at a time (file lock) exports the catalogue collections to
+# columnar .npy files: the 12-byte document ids, filename / URL bytes with
+# offsets, a tag bitmask and created_at / save_count. Each build goes into its own directory and the
+# CURRENT pointer file is swapped atomically; every worker memory-maps the
+# current build, so all of them share one physical copy through the page cache.
+CATALOGUE_SNAPSHOT_DIR = os.getenv(
+    "CATALOGUE_SNAPSHOT_DIR", os.path.join(settings.BASE_DIR, "data", "catalogue")
+)
+CATALOGUE_SNAPSHOT_INTERVAL = int(os.getenv("CATALOGUE_SNAPSHOT_INTERVAL", "300"))
+CATALOGUE_SNAPSHOT_LIMIT = 20000
+CATALOGUE_SNAPSHOT_KEEP = 2
+CATALOGUE_SNAPSHOT_CHECK_SECONDS = 5
+
+_POINTER = "CURRENT"
+
+
+def _pack_strings(values: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _pack_ids(values: list[str | None]) -> np.ndarray:
+    """ObjectId hex strings as an (n, 12) byte array; all-zero rows stand for a missing id."""
+    ids = np.zeros((len(values), 12), dtype=np.uint8)
+    for row, value in enumerate(values):
+        try:
+            ids[row] = np.frombuffer(ObjectId(value).binary, dtype=np.uint8)
+        except (InvalidId, TypeError):
+            pass
+    return ids
+
+
+def _write_table(directory: str, name: str, items: list[CatalogueItem]) -> list[str]:
+    vocabulary: dict[str, int] = {}
+    for item in items:
+        for tag in item.tags:
+            if isinstance(tag, str) and tag.strip():
+                vocabulary.setdefault(tag.strip().lower(), len(vocabulary))
+
+    words = max(1, (len(vocabulary) + 63) // 64)
+    tags = np.zeros((len(items), words), dtype="<u8")
+    for row, item in enumerate(items):
+        for tag in item.tags:
+            bit = vocabulary.get(tag.strip().lower()) if isinstance(tag, str) else None
+            if bit is not None:
+                tags[row, bit // 64] |= np.uint64(1 << (bit % 64))
+
+    filename_data, filename_offsets = _pack_strings([item.filename for item in items])
+    url_data, url_offsets = _pack_strings([item.url for item in items])
+    columns = {
+        "_id": _pack_ids([item.id for item in items]),
+        "filename_data": filename_data,
+        "filename_offsets": filename_offsets,
+        "url_data": url_data,
+        "url_offsets": url_offsets,
+        "tags": tags,
+        "created_at": np.array(
+            [int(item.created_at.replace(tzinfo=timezone.utc).timestamp()) if item.created_at else -1 for item in items],
+            dtype=np.int64,
+        ),
+        "save_count": np.array([item.save_count for item in items], dtype=np.int32),
+    }
+    for column, array in columns.items():
+        np.save(os.path.join(directory, f"{name}.{column}.npy"), array)
+    return sorted(vocabulary, key=vocabulary.get)
+
+
+def build_snapshot(get_collection, names, directory: str = CATALOGUE_SNAPSHOT_DIR,
+                   limit: int = CATALOGUE_SNAPSHOT_LIMIT) -> str:
+    """Export the newest `limit` items of each collection and publish them; returns the build directory."""
+    os.makedirs(directory, exist_ok=True)
+    version = f"{int(time.time() * 1000)}-{os.getpid()}"
+    build_dir = os.path.join(directory, f"snapshot-{version}")
+    # Written under a temporary name and renamed once complete: a failed build (Mongo down) leaves nothing behind
+    staging_dir = os.path.join(directory, f".building-{version}")
+    os.makedirs(staging_dir)
+    try:
+        meta = {"version": version, "built_at": time.time(), "collections": {}}
+        for name in names:
+            items = catalogue_items(
+                raw(get_collection(name)).find({}, CATALOGUE_PROJECTION).sort("created_at", -1).limit(limit)
+            )
+            if items:  # empty arrays can't be memory-mapped; a missing table means "nothing there"
+                meta["collections"][name] = {"count": len(items), "tags": _write_table(staging_dir, name, items)}
+        with open(os.path.join(staging_dir, "meta.json"), "w") as fh:
+            json.dump(meta, fh)
+        os.rename(staging_dir, build_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    pointer_tmp = os.path.join(directory, f"{_POINTER}.{version}.tmp")
+    with open(pointer_tmp, "w") as fh:
+        fh.write(os.path.basename(build_dir))
+    os.replace(pointer_tmp, os.path.join(directory, _POINTER))
+
+    # Old builds: unlinking is safe, workers that still map them keep their pages
+    builds = sorted(entry for entry in os.listdir(directory) if entry.startswith("snapshot-"))
+    for entry in builds[:-CATALOGUE_SNAPSHOT_KEEP]:
+        shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+    return build_dir
+
+
+class SnapshotTable:
+    """One collection of a snapshot; indexing yields CatalogueItems built on demand."""
+
+    def __init__(self, build_dir: str, name: str, tags: list[str]):
+        def column(key):
+            return np.load(os.path.join(build_dir, f"{name}.{key}.npy"), mmap_mode="r")
+
+        self.ids = column("_id")
+        self.filename_data = column("filename_data")
+        self.filename_offsets = column("filename_offsets")
+        self.url_data = column("url_data")
+        self.url_offsets = column("url_offsets")
+        self.tags = column("tags")
+        self.created_at = column("created_at")
+        self.save_count = column("save_count")
+        self.tag_bits = {tag: bit for bit, tag in enumerate(tags)}
+
+    def __len__(self) -> int:
+        return len(self.created_at)
+
+    @staticmethod
+    def _string(data, offsets, index: int) -> str:
+        return bytes(data[offsets[index]:offsets[index + 1]]).decode("utf-8")
+
+    def __getitem__(self, index: int) -> CatalogueItem:
+        index = int(index)
+        url = self._string(self.url_data, self.url_offsets, index)
+        created_at = int(self.created_at[index])
+        words = self.tags[index]
+        object_id = bytes(self.ids[index])
+        tags = tuple(tag for tag, bit in self.tag_bits.items() if int(words[bit // 64]) >> (bit % 64) & 1)
+        return CatalogueItem(
+            filename=self._string(self.filename_data, self.filename_offsets, index),
+            url=url,
+            source_url=url,
+            tags=tags,
+            created_at=datetime.utcfromtimestamp(created_at) if created_at >= 0 else None,
+            save_count=int(self.save_count[index]),
+            id=object_id.hex() if any(object_id) else None,
+        )
+
+    def relevance(self, profile: dict[str, float]) -> np.ndarray:
+        """Weighted tag overlap per row straight from the bitmask, O(rows x profile tags)."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        for tag, weight in profile.items():
+            bit = self.tag_bits.get(tag)
+            if bit is not None:
+                scores += weight * ((self.tags[:, bit // 64] >> np.uint64(bit % 64)) & np.uint64(1)).astype(np.float32)
+        return scores
+
+    def prior(self, now: float | None = None) -> np.ndarray:
+        """recency_weight x engagement_weight for every row, vectorised."""
+        now = now or time.time()
+        created = np.asarray(self.created_at)
+        age_days = np.maximum((now - created) / 86400.0, 0.0)
+        recency = np.where(
+            created >= 0, np.maximum(0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS), MIN_RECENCY_WEIGHT), 0.5
+        )
+        return recency * (1.0 + np.log1p(np.maximum(np.asarray(self.save_count), 0)))
+
+
+class CatalogueSnapshot:
+    def __init__(self, build_dir: str):
+        with open(os.path.join(build_dir, "meta.json")) as fh:
+            self.meta = json.load(fh)
+        self.build_dir = build_dir
+        self.tables = {
+            name: SnapshotTable(build_dir, name, info["tags"]) for name, info in self.meta["collections"].items()
+        }
+
+    @property
+    def built_at(self) -> float:
+        return self.meta["built_at"]
+
+    def table(self, name: str) -> SnapshotTable | None:
+        return self.tables.get(name)
+
+
+class SnapshotManager:
+    """The current snapshot for this process, reloaded when another process publishes a new one."""
+
+    def __init__(self, get_collection, names, directory: str = CATALOGUE_SNAPSHOT_DIR,
+                 interval: int = CATALOGUE_SNAPSHOT_INTERVAL):
+        self.get_collection = get_collection
+        self.names = list(names)
+        self.directory = directory
+        self.interval = interval
+        self._snapshot: CatalogueSnapshot | None = None
+        self._pointer = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> CatalogueSnapshot | None:
+        now = time.monotonic()
+        if now - self._checked_at < CATALOGUE_SNAPSHOT_CHECK_SECONDS:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = now
+            try:
+                with open(os.path.join(self.directory, _POINTER)) as fh:
+                    pointer = fh.read().strip()
+            except OSError:
+                return self._snapshot
+            if pointer != self._pointer:
+                try:
+                    self._snapshot = CatalogueSnapshot(os.path.join(self.directory, pointer))
+                    self._pointer = pointer
+                except (OSError, ValueError, KeyError) as exc:
+                    print(f"[DEBUG] Could not load catalogue snapshot {pointer}: {exc}")
+            return self._snapshot
+
+    def refresh(self) -> bool:
+        """Build a new snapshot if the published one is stale and no other process is building; True if built."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return False
+            self._checked_at = 0.0
+            snapshot = self.current()
+            if snapshot is not None and time.time() - snapshot.built_at < self.interval * 0.9:
+                return False
+            build_snapshot(self.get_collection, self.names, self.directory)
+            self._checked_at = 0.0
+            return True
+
+    def start(self) -> None:
+        def _loop():
+            while True:
+                try:
+                    if self.refresh():
+                        print(f"[DEBUG] Published catalogue snapshot for {self.names}")
+                except Exception as exc:
+                    print(f"[DEBUG] Catalogue snapshot build failed: {exc}")
+                time.sleep(self.interval)
+
+        threading.Thread(target=_loop, daemon=True, name="catalogue-snapshot").start()
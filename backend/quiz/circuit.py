@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import deque
+
+# --- Provider circuit breaker ---
+# Tracks every Gemini call per model over a rolling window. When too many calls
+# fail or run slow the circuit opens and callers fail fast (CircuitOpen) until
+# a cool-down passes; then a single half-open probe decides whether to close it.
+CIRCUIT_WINDOW_SECONDS = int(os.getenv("GENAI_CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_MIN_CALLS = int(os.getenv("GENAI_CIRCUIT_MIN_CALLS", "4"))
+CIRCUIT_ERROR_RATE = float(os.getenv("GENAI_CIRCUIT_ERROR_RATE", "0.5"))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("GENAI_CIRCUIT_SLOW_CALL_SECONDS", "30"))
+CIRCUIT_SLOW_RATE = float(os.getenv("GENAI_CIRCUIT_SLOW_RATE", "0.5"))
+CIRCUIT_COOLDOWN_SECONDS = int(os.getenv("GENAI_CIRCUIT_COOLDOWN_SECONDS", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    """The provider is known to be failing; the call was not attempted."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window_seconds: int = CIRCUIT_WINDOW_SECONDS, min_calls: int = CIRCUIT_MIN_CALLS,
+                 error_rate: float = CIRCUIT_ERROR_RATE, slow_call_seconds: float = CIRCUIT_SLOW_CALL_SECONDS,
+                 slow_rate: float = CIRCUIT_SLOW_RATE, cooldown_seconds: int = CIRCUIT_COOLDOWN_SECONDS):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.cooldown_seconds = cooldown_seconds
+        self._calls: deque = deque()  # (finished_at, ok, latency)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def available(self) -> bool:
+        """Cheap check for callers deciding whether to fall back before doing any work."""
+        return self.state != OPEN
+
+    def _allow(self) -> bool:
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown_seconds or self._probing:
+                return False
+            self._state = HALF_OPEN
+            self._probing = True
+            return True
+
+    def _trip(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        print(f"[DEBUG] Circuit '{self.name}' opened")
+
+    def record(self, ok: bool, latency: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if ok and latency < self.slow_call_seconds:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    print(f"[DEBUG] Circuit '{self.name}' closed")
+                else:
+                    self._trip(now)
+                return
+
+            self._calls.append((now, ok, latency))
+            while self._calls and now - self._calls[0][0] > self.window_seconds:
+                self._calls.popleft()
+            total = len(self._calls)
+            if self._state != CLOSED or total < self.min_calls:
+                return
+            errors = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+            slow = sum(1 for _, _, call_latency in self._calls if call_latency >= self.slow_call_seconds)
+            if errors / total >= self.error_rate or slow / total >= self.slow_rate:
+                self._trip(now)
+
+    def call(self, fn, *args, **kwargs):
+        if not self._allow():
+            raise CircuitOpen(self.name)
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(False, time.monotonic() - started)
+            raise
+        self.record(True, time.monotonic() - started)
+        return result
+
+
+class CircuitBreakers:
+    """One breaker per provider model, created on first use."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(f"{self.prefix}:{model}")
+            return breaker
+
+    def states(self) -> dict[str, str]:
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {model: breaker.state for model, breaker in breakers}
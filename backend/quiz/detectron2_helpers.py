@@ -1,29 +1,93 @@
+import os
+import threading
+
 from detectron2.config import get_cfg
 from detectron2.engine import DefaultPredictor
 from detectron2 import model_zoo
 import cv2
 import numpy as np
+import torch
+
+from .masks import garment_items, label_map, overlay
 
 # --- Setup predictor once ---
-cfg = get_cfg()
-cfg.merge_from_file(model_zoo.get_config_file("COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml"))
-cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = 0.5
-cfg.MODEL.WEIGHTS = model_zoo.get_checkpoint_url("COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml")
-cfg.MODEL.DEVICE = "cpu"  # force CPU
-predictor = DefaultPredictor(cfg)
-
-def segment_clothing(image_path: str):
-    """Return masks for clothing items in an image."""
-    img = cv2.imread(image_path)
-    outputs = predictor(img)
+# Built on first use, so web processes that only queue segmentation jobs never load the weights.
+# SEGMENTATION_BACKEND picks the CPU variant:
+#   "full"      - mask_rcnn_R_50_FPN_3x in fp32, as trained
+#   "quantized" - same weights, Linear layers (box head + predictors) dynamically quantized to int8
+# SEGMENTATION_MIN_SIZE_TEST shrinks the inference resolution (detectron2 default 800) for either.
+# Compare variants with `python manage.py benchmark_segmentation <fixtures dir>`.
+MODEL_CONFIG = "COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml"
+SEGMENTATION_BACKEND = os.getenv("SEGMENTATION_BACKEND", "full").strip().lower()
+SEGMENTATION_MIN_SIZE_TEST = int(os.getenv("SEGMENTATION_MIN_SIZE_TEST", "800"))
+SEGMENTATION_THREADS = int(os.getenv("SEGMENTATION_THREADS", "0"))  # 0 keeps torch's default
+BACKENDS = ("full", "quantized")
+
+_predictor = None
+_predictor_lock = threading.Lock()
+
+def build_predictor(backend: str = SEGMENTATION_BACKEND, min_size: int = SEGMENTATION_MIN_SIZE_TEST):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown segmentation backend '{backend}', expected one of {BACKENDS}")
+    if SEGMENTATION_THREADS:
+        torch.set_num_threads(SEGMENTATION_THREADS)
+
+    cfg = get_cfg()
+    cfg.merge_from_file(model_zoo.get_config_file(MODEL_CONFIG))
+    cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = 0.5
+    cfg.MODEL.WEIGHTS = model_zoo.get_checkpoint_url(MODEL_CONFIG)
+    cfg.MODEL.DEVICE = "cpu"  # force CPU
+    cfg.INPUT.MIN_SIZE_TEST = min_size
+    cfg.INPUT.MAX_SIZE_TEST = int(min_size * 1333 / 800)
+    predictor = DefaultPredictor(cfg)
+
+    if backend == "quantized":
+        predictor.model = torch.ao.quantization.quantize_dynamic(
+            predictor.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    print(f"[DEBUG] Segmentation predictor ready: backend={backend} min_size={min_size}")
+    return predictor
+
+def get_predictor():
+    global _predictor
+    with _predictor_lock:
+        if _predictor is None:
+            _predictor = build_predictor()
+        return _predictor
+
+def _load_image(image):
+    """Accept a file path or encoded image bytes; returns a BGR array."""
+    if isinstance(image, str):
+        return cv2.imread(image)
+    return cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+def segment_clothing(image):
+    """Return masks for clothing items in an image (path or encoded bytes)."""
+    img = _load_image(image)
+    if img is None:
+        raise ValueError("Could not decode image")
+    outputs = get_predictor()(img)
     masks = outputs["instances"].pred_masks.cpu().numpy()
     classes = outputs["instances"].pred_classes.cpu().numpy()
     return masks, classes
 
-def visualise_masks(image_path: str, masks: np.ndarray):
-    """Draw masks on image for quick visualisation."""
-    img = cv2.imread(image_path)
-    for mask in masks:
-        color = np.random.randint(0, 255, (1, 3), dtype=int)
-        img[mask] = color
-    return img  # returns as numpy array; you can save or convert to base64
+def visualise_masks(image, masks: np.ndarray) -> bytes:
+    """Draw masks on image for quick visualisation; returns JPEG bytes."""
+    img = _load_image(image)
+    img = overlay(img, label_map(masks))
+    ok, encoded = cv2.imencode(".jpg", img)
+    if not ok:
+        raise ValueError("Could not encode visualisation")
+    return encoded.tobytes()
+
+def segment_items(image_bytes: bytes) -> dict:
+    """Segment once and post-process: overlay, label map and per-garment RGBA thumbnails (see masks.py)."""
+    img = _load_image(image_bytes)
+    if img is None:
+        raise ValueError("Could not decode image")
+    instances = get_predictor()(img)["instances"]
+    return garment_items(
+        np.ascontiguousarray(img[..., ::-1]),  # BGR -> RGB for PIL encoding
+        instances.pred_masks.cpu().numpy(),
+        instances.pred_classes.cpu().numpy(),
+    )
@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+from django.conf import settings
+
+from .buffers import as_reader
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX dev machines only get the in-process lock
+    fcntl = None
+
+# --- CPU image embeddings + "more like this" index ---
+# Embedding: joint RGB colour histograms (4 bins per channel) over the whole
+# image and each 2x2 quadrant, Hellinger-normalised. Cheap enough to compute
+# inline at upload time on CPU.
+HIST_BINS = 4
+GRID = 2
+EMBEDDING_DIM = HIST_BINS ** 3 * (1 + GRID * GRID)
+LSH_BITS = 12
+LSH_SEED = 1234
+NEAR_DUPLICATE_THRESHOLD = 0.97
+
+EMBEDDING_INDEX_DIR = os.getenv(
+    "EMBEDDING_INDEX_DIR", os.path.join(settings.BASE_DIR, "data", "embeddings")
+)
+
+
+def _histogram(pixels: np.ndarray) -> np.ndarray:
+    quantized = (pixels // (256 // HIST_BINS)).astype(np.int32)
+    codes = (quantized[..., 0] * HIST_BINS + quantized[..., 1]) * HIST_BINS + quantized[..., 2]
+    return np.bincount(codes.ravel(), minlength=HIST_BINS ** 3).astype(np.float32)
+
+
+def compute_embedding(image_bytes) -> np.ndarray | None:
+    """Return a unit-length float32 vector for an encoded image, or None if it can't be decoded."""
+    try:
+        with Image.open(as_reader(image_bytes)) as img:
+            img = img.convert("RGB")
+            img.thumbnail((64, 64))
+            pixels = np.asarray(img)
+    except Exception as exc:
+        print(f"[DEBUG] Could not embed image: {exc}")
+        return None
+
+    height, width = pixels.shape[:2]
+    parts = [_histogram(pixels)]
+    for row in range(GRID):
+        for col in range(GRID):
+            cell = pixels[
+                row * height // GRID:(row + 1) * height // GRID,
+                col * width // GRID:(col + 1) * width // GRID,
+            ]
+            parts.append(_histogram(cell))
+
+    vector = np.sqrt(np.concatenate([part / max(part.sum(), 1.0) for part in parts]))
+    norm = np.linalg.norm(vector)
+    return (vector / norm).astype(np.float32) if norm else vector.astype(np.float32)
+
+
+class EmbeddingIndex:
+    """
+    Append-only on-disk index shared by every worker process:
+      vectors.f32  raw float32 rows, memory-mapped for reads
+      rows.jsonl   one {"filename", "url"} line per row
+    Appends take an exclusive flock on .lock, so a vector and its row land as a
+    pair even when several workers add images at once.
+    Approximate search probes random-hyperplane LSH buckets (exact Hamming
+    distance <= 1) and reranks the candidates by cosine similarity.
+    """
+
+    def __init__(self, directory: str = EMBEDDING_INDEX_DIR):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.rows_path = os.path.join(directory, "rows.jsonl")
+        self.lock_path = os.path.join(directory, ".lock")
+        self._lock = threading.Lock()
+        self._planes = np.random.default_rng(LSH_SEED).standard_normal((LSH_BITS, EMBEDDING_DIM)).astype(np.float32)
+        self._loaded_size = -1
+        self._matrix = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._rows: list[dict] = []
+        self._positions: dict[str, int] = {}
+        self._buckets: dict[int, list[int]] = {}
+
+    def _hash(self, vectors: np.ndarray) -> np.ndarray:
+        bits = (vectors @ self._planes.T) > 0
+        return bits.astype(np.int64) @ (1 << np.arange(LSH_BITS, dtype=np.int64))
+
+    def _refresh(self) -> None:
+        """Remap the files if another process appended rows since the last load."""
+        try:
+            size = os.path.getsize(self.rows_path)
+        except OSError:
+            return
+        if size == self._loaded_size:
+            return
+        with open(self.rows_path, "r", encoding="utf-8") as fh:
+            rows = [json.loads(line) for line in fh if line.strip()]
+        row_bytes = EMBEDDING_DIM * 4
+        count = min(len(rows), os.path.getsize(self.vectors_path) // row_bytes)
+        rows = rows[:count]
+        matrix = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, EMBEDDING_DIM))
+            if count else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        )
+        buckets: dict[int, list[int]] = {}
+        for position, code in enumerate(self._hash(np.asarray(matrix)).tolist()):
+            buckets.setdefault(code, []).append(position)
+
+        self._matrix = matrix
+        self._rows = rows
+        self._positions = {row["filename"]: pos for pos, row in enumerate(rows)}
+        self._buckets = buckets
+        self._loaded_size = size
+
+    def add(self, filename: str, url: str | None, image_bytes) -> bool:
+        vector = compute_embedding(image_bytes)
+        if vector is None:
+            return False
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.lock_path, "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._refresh()
+                if filename in self._positions:
+                    return True
+                # Drop a vector left without its row by a process that died in between
+                row_bytes = EMBEDDING_DIM * 4
+                if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > len(self._rows) * row_bytes:
+                    os.truncate(self.vectors_path, len(self._rows) * row_bytes)
+                # Vector first, then the row line that makes it visible to readers
+                with open(self.vectors_path, "ab") as fh:
+                    fh.write(vector.tobytes())
+                with open(self.rows_path, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps({"filename": filename, "url": url}) + "\n")
+        return True
+
+    def vector(self, filename: str) -> np.ndarray | None:
+        with self._lock:
+            self._refresh()
+            position = self._positions.get(filename)
+            return None if position is None else np.array(self._matrix[position])
+
+    def search(self, query: np.ndarray, k: int = 8, exclude: set[str] | None = None) -> list[dict]:
+        with self._lock:
+            self._refresh()
+            if not self._rows:
+                return []
+            code = int(self._hash(query[None, :])[0])
+            candidates: list[int] = list(self._buckets.get(code, []))
+            for bit in range(LSH_BITS):
+                candidates.extend(self._buckets.get(code ^ (1 << bit), []))
+            if len(candidates) < k + len(exclude or ()):
+                candidates = list(range(len(self._rows)))
+            positions = np.unique(np.asarray(candidates, dtype=np.intp))
+            scores = np.asarray(self._matrix[positions]) @ query
+            rows = self._rows
+
+        results = []
+        for idx in np.argsort(-scores):
+            row = rows[positions[idx]]
+            if exclude and row["filename"] in exclude:
+                continue
+            results.append({**row, "score": float(scores[idx])})
+            if len(results) >= k:
+                break
+        return results
+
+    def is_near_duplicate(self, filename: str, accepted: list[str], threshold: float = NEAR_DUPLICATE_THRESHOLD) -> bool:
+        """True if `filename` looks almost identical to one of the `accepted` images."""
+        if not accepted:
+            return False
+        with self._lock:
+            self._refresh()
+            position = self._positions.get(filename)
+            others = [self._positions[name] for name in accepted if name in self._positions]
+            if position is None or not others:
+                return False
+            similarity = np.asarray(self._matrix[others]) @ np.asarray(self._matrix[position])
+        return bool((similarity >= threshold).any())
+
+
+embedding_index = EmbeddingIndex()
@@ -0,0 +1,67 @@
+import hashlib
+import heapq
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from .sampling import sample_documents
+from .scoring import score_documents
+
+# --- Federated recommend: several collections queried concurrently ---
+FEDERATION_WORKERS = 8
+FEDERATION_TIMEOUT = 5.0
+
+_pool = ThreadPoolExecutor(max_workers=FEDERATION_WORKERS, thread_name_prefix="federated-recommend")
+
+
+def _timestamp(item) -> float:
+    return item.created_at.timestamp() if item.created_at else 0.0
+
+
+def federated_candidates(sources: dict, query_filter, k: int, profile: dict, slate_lookup=None) -> list:
+    """
+    Sample every source collection in parallel, rank each result list by
+    (relevance, recency), then k-way merge them and drop items whose URL or
+    content hash was already taken. Latency is that of the slowest source.
+    """
+    relevance = (lambda items: score_documents(items, profile)) if profile else None
+    sequence = itertools.count()
+
+    def _fetch(name, source_collection):
+        slate = slate_lookup(name) if slate_lookup else None
+        if slate is not None and slate.positions.size:
+            items = slate.sample(k)
+        else:
+            items = sample_documents(source_collection, query_filter, k, relevance=relevance)
+        scores = relevance(items) if relevance else [1.0] * len(items)
+        # heapq.merge wants ascending keys: negate; the counter breaks ties before items are compared
+        return sorted(
+            (-float(score), -_timestamp(item), next(sequence), item)
+            for score, item in zip(scores, items)
+        )
+
+    futures = {name: _pool.submit(_fetch, name, source) for name, source in sources.items()}
+    ranked_lists = []
+    for name, future in futures.items():
+        try:
+            ranked_lists.append(future.result(timeout=FEDERATION_TIMEOUT))
+        except Exception as exc:
+            print(f"[DEBUG] Federated source '{name}' failed: {exc}")
+
+    merged = []
+    seen_urls = set()
+    seen_hashes = set()
+    for *_, item in heapq.merge(*ranked_lists):
+        if item.url in seen_urls or (item.content_hash and item.content_hash in seen_hashes):
+            continue
+        seen_urls.add(item.url)
+        if item.content_hash:
+            seen_hashes.add(item.content_hash)
+        merged.append(item)
+        if len(merged) >= k:
+            break
+    return merged
+
+
+def content_hash(image_bytes) -> str:
+    """Stored on catalogue documents so byte-identical images dedupe across collections."""
+    return hashlib.sha1(image_bytes).hexdigest()
@@ -0,0 +1,86 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+from django.contrib.auth.hashers import check_password, make_password
+
+# --- Password hashing pool ---
+# PBKDF2 (hashlib) and Argon2 (argon2-cffi) both release the GIL, so a small
+# thread pool keeps hashing off the request threads' CPU share while bounding
+# how many hashes run or wait at once.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+PASSWORD_HASH_PER_IP = int(os.getenv("PASSWORD_HASH_PER_IP", "2"))
+PASSWORD_HASH_TIMEOUT = 10
+
+
+class HashingBusy(Exception):
+    """The hashing queue is full; the caller should retry shortly."""
+
+
+class HashingRateLimited(HashingBusy):
+    """This client already has too many hashes in flight."""
+
+
+class PasswordHasherPool:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 per_ip: int = PASSWORD_HASH_PER_IP):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self.per_ip = per_ip
+        self._per_ip_counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key: str) -> None:
+        with self._lock:
+            if self._per_ip_counts.get(key, 0) >= self.per_ip:
+                raise HashingRateLimited(key)
+            self._per_ip_counts[key] = self._per_ip_counts.get(key, 0) + 1
+        if not self._pending.acquire(blocking=False):
+            self._release_ip(key)
+            raise HashingBusy(key)
+
+    def _release_ip(self, key: str) -> None:
+        with self._lock:
+            remaining = self._per_ip_counts[key] - 1
+            if remaining:
+                self._per_ip_counts[key] = remaining
+            else:
+                del self._per_ip_counts[key]
+
+    def _release(self, key: str) -> None:
+        self._pending.release()
+        self._release_ip(key)
+
+    def _run(self, client_ip, fn, *args):
+        """
+        Hash on the pool. The queue slot and the client's slot are held until the
+        hash has actually finished, not just until this caller stops waiting, so
+        both bounds still hold when callers time out.
+        """
+        key = client_ip or "unknown"
+        self._acquire(key)
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._release(key)
+            raise
+        future.add_done_callback(lambda _: self._release(key))
+        try:
+            return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+        except FuturesTimeout:
+            raise HashingBusy(key)
+
+    def check(self, password: str, encoded: str, client_ip: str | None = None, setter=None) -> bool:
+        """
+        Verify on the pool. `setter(password)` is called (on the pool thread)
+        when the stored hash uses an outdated algorithm, see PASSWORD_HASHERS.
+        """
+        return self._run(client_ip, check_password, password, encoded, setter)
+
+    def make(self, password: str, client_ip: str | None = None) -> str:
+        return self._run(client_ip, make_password, password)
+
+
+password_hasher = PasswordHasherPool()
@@ -0,0 +1,106 @@
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def mask_agreement(reference, candidate) -> tuple[int, int, int, list[float]]:
+    """
+    Match candidate instances to the reference predictor's (same class, mask
+    IoU >= 0.5). Returns (matched, reference count, candidate count, best IoU per
+    reference instance). There is no ground truth here: the full-precision
+    model's output is the yardstick.
+    """
+    ref_masks, ref_classes = reference
+    cand_masks, cand_classes = candidate
+    if len(ref_masks) == 0 or len(cand_masks) == 0:
+        return 0, len(ref_masks), len(cand_masks), [0.0] * len(ref_masks)
+
+    ref_flat = ref_masks.reshape(len(ref_masks), -1).astype(np.float32)
+    cand_flat = cand_masks.reshape(len(cand_masks), -1).astype(np.float32)
+    intersection = ref_flat @ cand_flat.T
+    union = ref_flat.sum(1)[:, None] + cand_flat.sum(1)[None, :] - intersection
+    iou = np.where(union > 0, intersection / np.maximum(union, 1), 0.0)
+    iou[ref_classes[:, None] != cand_classes[None, :]] = 0.0
+
+    matched = 0
+    taken = set()
+    for row in np.argsort(-iou.max(axis=1)):
+        for col in np.argsort(-iou[row]):
+            if iou[row, col] < 0.5:
+                break
+            if col not in taken:
+                taken.add(col)
+                matched += 1
+                break
+    return matched, len(ref_masks), len(cand_masks), iou.max(axis=1).tolist()
+
+
+class Command(BaseCommand):
+    help = "Compare segmentation backends (latency and mask agreement with the full model) on local images."
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures", help="Directory of test images.")
+        parser.add_argument("--backends", default="full,quantized")
+        parser.add_argument("--min-sizes", default="800,600", help="Comma separated SEGMENTATION_MIN_SIZE_TEST values.")
+        parser.add_argument("--runs", type=int, default=3, help="Timed runs per image (median is reported).")
+        parser.add_argument("--limit", type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            from quiz.detectron2_helpers import _load_image, build_predictor
+        except ModuleNotFoundError as exc:
+            raise CommandError(f"Segmentation dependencies missing: {exc}")
+
+        paths = sorted(p for p in Path(options["fixtures"]).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        paths = paths[:options["limit"]]
+        if not paths:
+            raise CommandError("No images found in the fixtures directory.")
+        images = [_load_image(str(path)) for path in paths]
+
+        def run(predictor):
+            outputs, latencies = [], []
+            predictor(images[0])  # warm-up
+            for img in images:
+                timings = []
+                for _ in range(max(1, options["runs"])):
+                    started = time.perf_counter()
+                    instances = predictor(img)["instances"]
+                    timings.append(time.perf_counter() - started)
+                latencies.append(statistics.median(timings))
+                outputs.append((instances.pred_masks.cpu().numpy(), instances.pred_classes.cpu().numpy()))
+            return outputs, latencies
+
+        self.stdout.write(f"{len(images)} images, {options['runs']} runs each")
+        reference, reference_latencies = run(build_predictor("full", 800))
+        variants = [
+            (backend.strip(), int(size))
+            for backend in options["backends"].split(",") if backend.strip()
+            for size in options["min_sizes"].split(",") if size.strip()
+        ]
+
+        header = f"{'backend':<10} {'min_size':>8} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} {'recall':>7} {'precision':>9} {'mIoU':>6}"
+        self.stdout.write(header)
+        base_p50 = statistics.median(reference_latencies)
+        for backend, size in variants:
+            if (backend, size) == ("full", 800):
+                outputs, latencies = reference, reference_latencies
+            else:
+                outputs, latencies = run(build_predictor(backend, size))
+            matched = ref_total = cand_total = 0
+            best_ious = []
+            for ref, cand in zip(reference, outputs):
+                m, r, c, ious = mask_agreement(ref, cand)
+                matched, ref_total, cand_total = matched + m, ref_total + r, cand_total + c
+                best_ious.extend(ious)
+            p50 = statistics.median(latencies)
+            p95 = float(np.percentile(latencies, 95))
+            self.stdout.write(
+                f"{backend:<10} {size:>8} {p50 * 1000:>8.0f} {p95 * 1000:>8.0f} {base_p50 / p50:>7.2f}x "
+                f"{matched / max(ref_total, 1):>7.3f} {matched / max(cand_total, 1):>9.3f} "
+                f"{(sum(best_ious) / len(best_ious) if best_ious else 1.0):>6.3f}"
+            )
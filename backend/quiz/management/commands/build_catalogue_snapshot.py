@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from quiz.catalogue_snapshot import CATALOGUE_SNAPSHOT_DIR, CATALOGUE_SNAPSHOT_LIMIT, build_snapshot
+
+
+class Command(BaseCommand):
+    help = "Export the catalogue collections to a memory-mapped snapshot (run before starting workers)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--collections", default="images,instantoutfit")
+        parser.add_argument("--limit", type=int, default=CATALOGUE_SNAPSHOT_LIMIT)
+        parser.add_argument("--directory", default=CATALOGUE_SNAPSHOT_DIR)
+
+    def handle(self, *args, **options):
+        from quiz.mongo import read_client
+
+        names = [name.strip() for name in options["collections"].split(",") if name.strip()]
+        build_dir = build_snapshot(
+            lambda name: read_client["outfits"][name], names, options["directory"], options["limit"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Published catalogue snapshot {build_dir}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from quiz.wardrobe import ensure_wardrobe_indexes, remove_duplicate_rows
+
+
+class Command(BaseCommand):
+    help = "Remove duplicate (user_id, filename) wardrobe rows and build the unique index save_image relies on."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be removed.")
+
+    def handle(self, *args, **options):
+        from quiz.mongo import primary_client
+
+        wardrobe = primary_client["users_db"]["wardrobe"]
+        try:
+            if options["dry_run"]:
+                count = remove_duplicate_rows(wardrobe, dry_run=True)
+                self.stdout.write(f"{count} duplicate wardrobe rows would be removed.")
+                return
+            removed = remove_duplicate_rows(wardrobe)
+            ensure_wardrobe_indexes(wardrobe)
+        except PyMongoError as exc:
+            raise CommandError(f"Could not build the unique wardrobe index: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} duplicate wardrobe rows; unique index in place."))
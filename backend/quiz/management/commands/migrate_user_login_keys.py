@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from quiz.users import USER_MIGRATION_BATCH, UserStore
+
+
+class Command(BaseCommand):
+    help = "Create the unique login_key index and backfill login_key on existing users."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=USER_MIGRATION_BATCH)
+
+    def handle(self, *args, **options):
+        from quiz.mongo import primary_client
+
+        store = UserStore(primary_client["users_db"]["users"])
+        store.ensure_indexes()
+        updated, conflicts = store.migrate_login_keys(batch_size=max(1, options["batch_size"]))
+        for user_id in conflicts:
+            self.stderr.write(f"  login key of user {user_id} is already taken by another user; merge manually")
+        self.stdout.write(self.style.SUCCESS(f"Backfilled login_key on {updated} users ({len(conflicts)} conflicts)."))
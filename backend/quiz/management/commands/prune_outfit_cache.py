@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from quiz.models import OUTFIT_CACHE_MAX_ENTRIES, PRUNE_BATCH_SIZE, prune_old_outfits
+
+
+class Command(BaseCommand):
+    help = "Delete expired and least recently used OutfitCache rows in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--max-entries", type=int, default=OUTFIT_CACHE_MAX_ENTRIES)
+        parser.add_argument("--batch-size", type=int, default=PRUNE_BATCH_SIZE)
+        parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches.")
+
+    def handle(self, *args, **options):
+        def progress(deleted, elapsed):
+            rate = deleted / elapsed if elapsed else 0.0
+            self.stdout.write(f"  deleted {deleted} rows in {elapsed:.1f}s ({rate:.0f} rows/s)")
+
+        deleted = prune_old_outfits(
+            days=options["days"],
+            max_entries=options["max_entries"],
+            batch_size=max(1, options["batch_size"]),
+            pause=options["pause"],
+            progress=progress if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} outfit cache entries."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from quiz.segmentation_jobs import SEGMENT_WORKER_POLL_SECONDS, run_worker
+
+
+class Command(BaseCommand):
+    help = "Process queued segmentation jobs and upload their results to R2."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty.")
+        parser.add_argument("--poll", type=float, default=SEGMENT_WORKER_POLL_SECONDS,
+                            help="Seconds to wait between polls of an empty queue.")
+
+    def handle(self, *args, **options):
+        # Shares the views' Mongo handles and R2 uploader (including its retry spool)
+        from quiz.views import r2_uploader, segmentation_queue
+
+        handled = run_worker(
+            segmentation_queue,
+            r2_uploader,
+            once=options["once"],
+            poll_seconds=options["poll"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Processed {handled} segmentation jobs."))
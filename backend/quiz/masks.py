@@ -0,0 +1,116 @@
+import colorsys
+import io
+
+import numpy as np
+from PIL import Image
+
+# --- Vectorised mask post-processing ---
+# All instance masks collapse into one label map (0 = background, i + 1 =
+# instance i). Overlay, bounding boxes and crops are computed from that map,
+# so compositing touches every pixel once however many items were detected.
+THUMBNAIL_MAX_SIDE = 512
+MIN_ITEM_PIXELS = 400
+OVERLAY_ALPHA = 0.55
+
+# Tags for the COCO classes the predictor can return for worn / carried items
+COCO_TAGS = {0: "outfit", 24: "backpack", 25: "umbrella", 26: "handbag", 27: "tie", 28: "suitcase"}
+
+
+def _palette(size: int = 256) -> np.ndarray:
+    """Fixed, well-spread colours (golden-ratio hues); row 0 is background."""
+    colours = [colorsys.hsv_to_rgb((i * 0.618033988749895) % 1.0, 0.75, 0.95) for i in range(size)]
+    lut = (np.array(colours) * 255).astype(np.uint8)
+    lut[0] = 0
+    return lut
+
+
+PALETTE = _palette()
+
+
+def label_map(masks: np.ndarray) -> np.ndarray:
+    """
+    (N, H, W) bool masks -> (H, W) uint16 labels. Where masks overlap the
+    earlier (higher scoring, as the predictor orders them) instance wins.
+    """
+    masks = np.asarray(masks, dtype=bool)
+    if masks.ndim != 3 or masks.shape[0] == 0:
+        return np.zeros(masks.shape[-2:] if masks.ndim >= 2 else (0, 0), dtype=np.uint16)
+    first = np.argmax(masks, axis=0).astype(np.uint16) + 1
+    return np.where(masks.any(axis=0), first, 0).astype(np.uint16)
+
+
+def overlay(image: np.ndarray, labels: np.ndarray, alpha: float = OVERLAY_ALPHA) -> np.ndarray:
+    """Blend one palette colour per instance over the image through a single LUT lookup."""
+    colours = PALETTE[labels % len(PALETTE)]
+    painted = labels > 0
+    out = image.copy()
+    out[painted] = (image[painted] * (1 - alpha) + colours[painted] * alpha).astype(image.dtype)
+    return out
+
+
+def bounding_boxes(labels: np.ndarray, count: int) -> tuple[np.ndarray, np.ndarray]:
+    """Tight (x0, y0, x1, y1) box (exclusive end) and pixel area per instance, from one pass over the map."""
+    ys, xs = np.nonzero(labels)
+    ids = labels[ys, xs].astype(np.intp) - 1
+    height, width = labels.shape
+    x0 = np.full(count, width)
+    y0 = np.full(count, height)
+    x1 = np.zeros(count, dtype=np.intp)
+    y1 = np.zeros(count, dtype=np.intp)
+    np.minimum.at(x0, ids, xs)
+    np.minimum.at(y0, ids, ys)
+    np.maximum.at(x1, ids, xs + 1)
+    np.maximum.at(y1, ids, ys + 1)
+    areas = np.bincount(ids, minlength=count)
+    return np.stack([x0, y0, x1, y1], axis=1), areas
+
+
+def alpha_crop(image: np.ndarray, labels: np.ndarray, label: int, box) -> np.ndarray:
+    """RGBA crop of one instance: pixels outside its mask are transparent."""
+    x0, y0, x1, y1 = (int(value) for value in box)
+    region = image[y0:y1, x0:x1]
+    alpha = np.where(labels[y0:y1, x0:x1] == label, 255, 0).astype(np.uint8)
+    return np.dstack([region, alpha])
+
+
+def encode_thumbnail(rgba: np.ndarray, max_side: int = THUMBNAIL_MAX_SIDE) -> bytes:
+    thumbnail = Image.fromarray(rgba)
+    thumbnail.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def encode_image(array: np.ndarray, format: str = "JPEG") -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format=format, quality=85)
+    return buffer.getvalue()
+
+
+def garment_items(image_rgb: np.ndarray, masks: np.ndarray, classes, min_pixels: int = MIN_ITEM_PIXELS) -> dict:
+    """
+    Everything a segmentation produces, from one label map: the overlay, the
+    label map itself (PNG, for clients that want the masks) and an RGBA
+    thumbnail plus box/area/tags for every visible item.
+    """
+    labels = label_map(masks)
+    count = int(np.asarray(masks).shape[0]) if np.asarray(masks).ndim == 3 else 0
+    boxes, areas = bounding_boxes(labels, count)
+    items = []
+    for index in range(count):
+        if areas[index] < min_pixels:
+            continue  # fully hidden behind a higher scoring item, or noise
+        class_id = int(classes[index])
+        items.append({
+            "label": index + 1,
+            "class_id": class_id,
+            "tags": [COCO_TAGS.get(class_id, "item")],
+            "bbox": [int(value) for value in boxes[index]],
+            "area": int(areas[index]),
+            "thumbnail": encode_thumbnail(alpha_crop(image_rgb, labels, index + 1, boxes[index])),
+        })
+    return {
+        "overlay": encode_image(overlay(image_rgb, labels)),
+        "label_map": encode_image(labels.astype(np.uint8 if count < 256 else np.uint16), format="PNG"),
+        "items": items,
+    }
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0002_alter_outfitcache_image_alter_outfitcache_query'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outfitcache',
+            name='images',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='outfitcache',
+            name='hit_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='outfitcache',
+            name='last_used_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
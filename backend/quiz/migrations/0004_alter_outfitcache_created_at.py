@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0003_outfitcache_images_hit_count_last_used_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outfitcache',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
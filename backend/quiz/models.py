@@ -1,17 +1,102 @@
 # quiz/models.py
-from django.db import models
+import time
+from datetime import timedelta
+
+from django.db import connection, models
+from django.db.models import F, Max, Min
 from django.utils import timezone
 from django.contrib.postgres.fields import ArrayField
 
+OUTFIT_CACHE_TTL_DAYS = 7
+OUTFIT_CACHE_MAX_ENTRIES = 5000
+PRUNE_BATCH_SIZE = 500
+
 class OutfitCache(models.Model):
     query = models.CharField(max_length=255, unique=True)
     image = models.CharField(max_length=500)
+    images = models.JSONField(default=list)  # every cached URL for the prompt; `image` is the first
     tags = models.JSONField(default=list)  # <- JSONField handles lists properly
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    hit_count = models.PositiveIntegerField(default=0)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
 
-from django.utils import timezone
-from datetime import timedelta
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        return " ".join(str(text).lower().split())[:255]
+
+    @classmethod
+    def lookup(cls, query: str, ttl_days: int = OUTFIT_CACHE_TTL_DAYS):
+        """Return the fresh entry for a prompt and record the hit, or None."""
+        cutoff = timezone.now() - timedelta(days=ttl_days)
+        entry = cls.objects.filter(query=cls.normalize_query(query), created_at__gte=cutoff).first()
+        if entry is None:
+            return None
+        cls.objects.filter(pk=entry.pk).update(hit_count=F("hit_count") + 1, last_used_at=timezone.now())
+        return entry
+
+    @classmethod
+    def remember(cls, query: str, urls: list[str], tags: list[str]):
+        """Store (or refresh) the generated URLs for a prompt."""
+        urls = [url for url in urls if url]
+        if not urls:
+            return None
+        entry, _ = cls.objects.update_or_create(
+            query=cls.normalize_query(query),
+            defaults={
+                "image": urls[0],
+                "images": urls,
+                "tags": list(tags),
+                "created_at": timezone.now(),
+                "last_used_at": timezone.now(),
+            },
+        )
+        return entry
+
+def _raw_delete(where: str, params) -> int:
+    table = connection.ops.quote_name(OutfitCache._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {where}", params)
+        return max(cursor.rowcount, 0)
+
+def prune_old_outfits(days=30, max_entries=OUTFIT_CACHE_MAX_ENTRIES, batch_size=PRUNE_BATCH_SIZE,
+                      pause=0.0, progress=None):
+    """
+    Constant-memory pruning with raw, autocommitted DELETEs:
+      1. TTL: walk primary-key ranges up to the newest expired row (found via
+         the created_at index), one short statement per `batch_size` ids.
+      2. LRU: drop the least recently used rows beyond `max_entries`.
+    `progress(deleted, elapsed_seconds)` is called after every batch.
+    """
+    started = time.monotonic()
+    deleted = 0
+
+    def _report():
+        if progress is not None:
+            progress(deleted, time.monotonic() - started)
+        if pause:
+            time.sleep(pause)
 
-def prune_old_outfits(days=30):
     cutoff = timezone.now() - timedelta(days=days)
-    OutfitCache.objects.filter(created_at__lt=cutoff).delete()
+    bounds = OutfitCache.objects.filter(created_at__lt=cutoff).aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is not None:
+        for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+            deleted += _raw_delete(
+                "id >= %s AND id < %s AND created_at < %s",
+                [start, start + batch_size, cutoff],
+            )
+            _report()
+
+    overflow = OutfitCache.objects.count() - max_entries
+    while overflow > 0:
+        ids = list(
+            OutfitCache.objects.order_by("last_used_at")
+            .values_list("pk", flat=True)[:min(batch_size, overflow)]
+        )
+        if not ids:
+            break
+        removed = _raw_delete(f"id IN ({', '.join(['%s'] * len(ids))})", ids)
+        deleted += removed
+        overflow -= len(ids)
+        _report()
+
+    return deleted
@@ -0,0 +1,43 @@
+import os
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+load_dotenv()
+
+# --- Mongo clients ---
+# One client for writes (primary) and one for the read-heavy endpoints, which
+# may be routed to secondaries with bounded staleness. Set
+# MONGO_READ_PREFERENCE=primary to keep every read on the primary.
+MONGO_URI = os.getenv("MONGO_URI")
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,zlib")
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_READ_MAX_POOL_SIZE = int(os.getenv("MONGO_READ_MAX_POOL_SIZE", "100"))
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "secondaryPreferred")
+MONGO_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "90"))  # server minimum is 90
+
+
+def _common_options() -> dict:
+    return {
+        "compressors": MONGO_COMPRESSORS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "maxIdleTimeMS": 60000,
+        "retryReads": True,
+        "appname": "dressi-backend",
+    }
+
+
+def _read_options() -> dict:
+    options = {**_common_options(), "maxPoolSize": MONGO_READ_MAX_POOL_SIZE, "readPreference": MONGO_READ_PREFERENCE}
+    if MONGO_READ_PREFERENCE != "primary":
+        options["maxStalenessSeconds"] = max(MONGO_MAX_STALENESS_SECONDS, 90)
+    return options
+
+
+primary_client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE, retryWrites=True, **_common_options())
+read_client = MongoClient(MONGO_URI, **_read_options())
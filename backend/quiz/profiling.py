@@ -0,0 +1,149 @@
+import cProfile
+import hashlib
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+
+# --- Opt-in per-request profiling ---
+# A request is profiled when it carries a valid X-Profile-Token header
+# ("<unix ts>.<hex hmac-sha256(PROFILE_SECRET, '<path>:<ts>')>") or falls in
+# the PROFILE_SAMPLE_RATE fraction. Results land in data/profiles/<request id>.*
+# and the id is echoed in X-Profile-Id. With no secret and a zero rate the
+# decorator returns the view untouched.
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")  # "sample" (folded stacks) or "cprofile" (pstats)
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000.0
+PROFILE_TOKEN_MAX_AGE = 300
+PROFILE_MAX_FILES = 300
+PROFILE_DIR = Path(__file__).resolve().parent.parent / "data" / "profiles"
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_profile_lock = threading.Lock()  # one profiled request at a time keeps tracemalloc numbers honest
+
+
+def sign_profile_token(path: str, timestamp: int | None = None, secret: str = PROFILE_SECRET) -> str:
+    timestamp = int(timestamp or time.time())
+    digest = hmac.new(secret.encode(), f"{path}:{timestamp}".encode(), hashlib.sha256).hexdigest()
+    return f"{timestamp}.{digest}"
+
+
+def _token_valid(request) -> bool:
+    token = request.META.get("HTTP_X_PROFILE_TOKEN")
+    if not token or not PROFILE_SECRET:
+        return False
+    timestamp, _, _ = token.partition(".")
+    try:
+        if abs(time.time() - int(timestamp)) > PROFILE_TOKEN_MAX_AGE:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(token, sign_profile_token(request.path, int(timestamp)))
+
+
+def _request_id(request) -> str:
+    candidate = request.META.get("HTTP_X_REQUEST_ID", "")
+    return candidate if _REQUEST_ID.match(candidate) else uuid.uuid4().hex
+
+
+class _StackSampler:
+    """Samples one thread's stack every interval into flamegraph-ready folded counts."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="profile-sampler")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: Path):
+        with open(path, "w") as handle:
+            for stack, count in self.counts.most_common():
+                handle.write(f"{stack} {count}\n")
+
+
+def _prune_profiles():
+    files = sorted(PROFILE_DIR.iterdir(), key=lambda path: path.stat().st_mtime)
+    for path in files[:-PROFILE_MAX_FILES]:
+        path.unlink(missing_ok=True)
+
+
+def _profile_call(request_id: str, label: str, view, request, args, kwargs):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(10)
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        if PROFILE_MODE == "cprofile":
+            profiler = cProfile.Profile()
+            response = profiler.runcall(view, request, *args, **kwargs)
+            profiler.dump_stats(PROFILE_DIR / f"{request_id}.prof")
+        else:
+            with _StackSampler(threading.get_ident(), PROFILE_INTERVAL_SECONDS) as sampler:
+                response = view(request, *args, **kwargs)
+            sampler.dump(PROFILE_DIR / f"{request_id}.folded")
+    finally:
+        elapsed = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:25]
+        if started_tracing:
+            tracemalloc.stop()
+        with open(PROFILE_DIR / f"{request_id}.mem.txt", "w") as handle:
+            handle.write(f"view={label} path={request.path} elapsed={elapsed:.3f}s\n")
+            handle.write(f"traced current={current} peak={peak}\n\n")
+            handle.writelines(f"{stat}\n" for stat in top)
+        _prune_profiles()
+    print(f"[DEBUG] Profiled {label} as {request_id} in {elapsed:.3f}s")
+    return response
+
+
+def profiled(label: str):
+    """View decorator; a no-op unless PROFILE_SECRET or PROFILE_SAMPLE_RATE is set."""
+    def decorator(view):
+        if not PROFILE_SECRET and PROFILE_SAMPLE_RATE <= 0:
+            return view
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            wanted = _token_valid(request) or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+            if not wanted or not _profile_lock.acquire(blocking=False):
+                return view(request, *args, **kwargs)
+            try:
+                request_id = _request_id(request)
+                response = _profile_call(request_id, label, view, request, args, kwargs)
+            finally:
+                _profile_lock.release()
+            response["X-Profile-Id"] = request_id
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,108 @@
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime
+from urllib.parse import quote
+
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+# --- Compact read models for projected Mongo reads ---
+PUBLIC_URL_BASE = os.getenv("PUBLIC_URL_BASE") or ""
+
+# Decode lazily: fields are only materialised when a read model is built
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument, tz_aware=False)
+
+CATALOGUE_PROJECTION = {
+    "_id": 1, "filename": 1, "images": 1, "image": 1, "image_url": 1, "source_url": 1,
+    "tags": 1, "created_at": 1, "saved_at": 1, "save_count": 1, "content_hash": 1,
+}
+GENERATED_PROJECTION = {"_id": 0, "filename": 1, "tags": 1, "images": 1}
+WARDROBE_PROJECTION = {"_id": 1, "filename": 1, "image_url": 1, "tags": 1}
+USER_AUTH_PROJECTION = {"_id": 1, "email": 1, "username": 1, "password_hash": 1, "display_name": 1}
+
+
+def raw(collection):
+    """The same collection, returning RawBSONDocument instead of dicts."""
+    return collection.with_options(codec_options=RAW_CODEC_OPTIONS)
+
+
+@dataclass(slots=True, frozen=True)
+class CatalogueItem:
+    filename: str
+    url: str
+    source_url: str
+    tags: tuple
+    created_at: datetime | None = None
+    save_count: int = 0
+    content_hash: str | None = None
+    id: str | None = None
+
+    @classmethod
+    def from_doc(cls, doc: Mapping) -> "CatalogueItem | None":
+        """Build from a catalogue document; wardrobe documents (image_url, saved_at) work too."""
+        filename = doc.get("filename")
+        if not filename:
+            return None
+
+        url = None
+        images = doc.get("images")
+        if isinstance(images, Mapping):
+            url = images.get("full") or images.get("thumbnail")
+        if not url:
+            url = doc.get("image") or doc.get("image_url")
+        if not url:
+            url = f"{PUBLIC_URL_BASE}{quote(filename, safe='-_.')}"
+
+        created_at = doc.get("created_at") or doc.get("saved_at")
+        try:
+            save_count = int(doc.get("save_count") or 0)
+        except (TypeError, ValueError):
+            save_count = 0
+        return cls(
+            filename=filename,
+            url=url,
+            source_url=doc.get("source_url") or url,
+            tags=tuple(doc.get("tags") or ()),
+            created_at=created_at if isinstance(created_at, datetime) else None,
+            save_count=save_count,
+            content_hash=doc.get("content_hash"),
+            id=str(doc["_id"]) if doc.get("_id") is not None else None,
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.filename,
+            "image": self.url,
+            "tags": list(self.tags),
+            "source_url": self.source_url,
+        }
+
+
+def catalogue_items(docs) -> list[CatalogueItem]:
+    return [item for item in map(CatalogueItem.from_doc, docs) if item is not None]
+
+
+@dataclass(slots=True, frozen=True)
+class WardrobeItem:
+    id: str
+    filename: str
+    image_url: str
+    tags: tuple
+
+    @classmethod
+    def from_doc(cls, doc: Mapping) -> "WardrobeItem":
+        return cls(
+            id=str(doc.get("_id")),
+            filename=doc.get("filename", ""),
+            image_url=doc.get("image_url", ""),
+            tags=tuple(doc.get("tags") or ()),
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.filename,
+            "image": self.image_url,
+            "tags": list(self.tags),
+        }
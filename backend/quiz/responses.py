@@ -0,0 +1,117 @@
+import gzip
+import json
+from functools import wraps
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ModuleNotFoundError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ModuleNotFoundError:  # pragma: no cover - optional codec
+    brotli = None
+
+# --- Fast JSON responses + negotiated compression ---
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, default=str, separators=(",", ":")).encode("utf-8")
+
+
+class FastJsonResponse(HttpResponse):
+    """Drop-in for JsonResponse for dict payloads, serialised with orjson when installed."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class StreamingOutfitsResponse(StreamingHttpResponse):
+    """
+    {"outfits": [...]} where entries are dicts or (dict, ImageBuffer) pairs.
+    Buffers are streamed as base64 data URIs chunk by chunk, so the full
+    encoded payload never exists in memory.
+    """
+
+    def __init__(self, entries, extra=None, mime_type="image/png", **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(streaming_content=self._render(entries, extra or {}, mime_type), **kwargs)
+
+    @staticmethod
+    def _render(entries, extra, mime_type):
+        yield b'{"outfits":['
+        for index, entry in enumerate(entries):
+            if index:
+                yield b","
+            if not isinstance(entry, tuple):
+                yield dumps(entry)
+                continue
+            fields, buffer = entry
+            head = dumps(fields)[:-1]
+            yield head + (b"," if len(head) > 1 else b"") + f'"image":"data:{mime_type};base64,'.encode()
+            yield from buffer.base64_chunks()
+            yield b'"}'
+        yield b"]"
+        if extra:
+            yield b"," + dumps(extra)[1:-1]
+        yield b"}"
+
+
+def _pick_encoding(accept_encoding: str) -> str | None:
+    offered = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in {"q=0", "q=0.0"}:
+            continue
+        offered.add(name.strip().lower())
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+def compressed(view_func):
+    """
+    Compress the view's response with brotli or gzip, whichever the client
+    accepts. Applied per view (not site-wide) so auth responses carrying
+    tokens are never compressed.
+    """
+
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if hasattr(response, "render") and not response.is_rendered:
+            # DRF error responses arrive unrendered
+            response.render()
+        if response.streaming or response.has_header("Content-Encoding"):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < MIN_COMPRESS_BYTES:
+            return response
+
+        encoding = _pick_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding == "br":
+            body = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        elif encoding == "gzip":
+            body = gzip.compress(response.content, compresslevel=GZIP_LEVEL, mtime=0)
+        else:
+            return response
+        if len(body) >= len(response.content):
+            return response
+
+        response.content = body
+        response["Content-Length"] = str(len(body))
+        response["Content-Encoding"] = encoding
+        return response
+
+    return _wrapped
@@ -0,0 +1,128 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from pymongo.errors import OperationFailure, PyMongoError
+
+# --- Query result cache (local LRU + optional shared tier) ---
+RESULT_CACHE_MAX_ENTRIES = 512
+RESULT_CACHE_TTL = 60
+SHARED_CACHE_ALIAS = "shared"
+
+
+class QueryResultCache:
+    """
+    Caches query results keyed by a normalised tag set.
+
+    Local entries live in a per-process LRU. When a "shared" Django cache is
+    configured, results are also stored there and every read checks a shared
+    epoch counter, so a write in any worker invalidates all of them. Without a
+    shared tier, a Mongo change stream (replica sets only) or the TTL bounds
+    cross-worker staleness.
+    """
+
+    def __init__(self, name: str, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl: int = RESULT_CACHE_TTL):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple, tuple[float, int, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        try:
+            self._shared = caches[SHARED_CACHE_ALIAS]
+        except InvalidCacheBackendError:
+            self._shared = None
+
+    @staticmethod
+    def make_key(tags) -> tuple:
+        return tuple(sorted({str(tag).strip().lower() for tag in tags if tag}))
+
+    def _epoch_key(self) -> str:
+        return f"{self.name}:epoch"
+
+    def _shared_key(self, key: tuple, epoch: int) -> str:
+        digest = hashlib.sha1("|".join(key).encode("utf-8")).hexdigest()
+        return f"{self.name}:{epoch}:{digest}"
+
+    def _epoch(self) -> int:
+        if self._shared is None:
+            return 0
+        try:
+            return int(self._shared.get(self._epoch_key(), 0))
+        except Exception:
+            return 0
+
+    def get(self, key: tuple):
+        epoch = self._epoch()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_epoch, value = entry
+                if expires_at > now and entry_epoch == epoch:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+        if self._shared is None:
+            return None
+        try:
+            value = self._shared.get(self._shared_key(key, epoch))
+        except Exception:
+            return None
+        if value is not None:
+            self._store_local(key, epoch, value)
+        return value
+
+    def set(self, key: tuple, value) -> None:
+        epoch = self._epoch()
+        self._store_local(key, epoch, value)
+        if self._shared is not None:
+            try:
+                self._shared.set(self._shared_key(key, epoch), value, self.ttl)
+            except Exception as exc:
+                print(f"[DEBUG] Shared cache write failed for {self.name}: {exc}")
+
+    def _store_local(self, key: tuple, epoch: int, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, epoch, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tags=None) -> None:
+        """Drop local entries sharing a tag with `tags` (all if None) and bump the shared epoch."""
+        touched = set(self.make_key(tags)) if tags is not None else None
+        with self._lock:
+            if touched is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if touched.intersection(key)]:
+                    del self._entries[key]
+        if self._shared is not None:
+            try:
+                self._shared.add(self._epoch_key(), 0, None)
+                self._shared.incr(self._epoch_key())
+            except Exception as exc:
+                print(f"[DEBUG] Shared cache epoch bump failed for {self.name}: {exc}")
+
+    def watch(self, mongo_collection, pipeline=None, retry_delay: int = 60) -> None:
+        """Invalidate from a Mongo change stream in the background; gives up on standalone servers."""
+
+        def _loop():
+            while True:
+                try:
+                    with mongo_collection.watch(pipeline or []) as stream:
+                        for change in stream:
+                            document = change.get("fullDocument") or {}
+                            self.invalidate(document.get("tags") or None)
+                except OperationFailure as exc:
+                    print(f"[DEBUG] Change stream unavailable for {self.name}: {exc}")
+                    return
+                except PyMongoError as exc:
+                    print(f"[DEBUG] Change stream for {self.name} dropped: {exc}")
+                time.sleep(retry_delay)
+
+        threading.Thread(target=_loop, daemon=True, name=f"{self.name}-watch").start()
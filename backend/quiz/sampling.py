@@ -0,0 +1,69 @@
+import math
+from datetime import datetime
+
+import numpy as np
+
+from .read_models import CATALOGUE_PROJECTION, catalogue_items, raw
+from .scoring import top_k
+
+# --- Weighted sampling for recommendations ---
+SAMPLE_POOL_SIZE = 200
+RECENCY_HALF_LIFE_DAYS = 14.0
+MIN_RECENCY_WEIGHT = 0.01
+
+_rng = np.random.default_rng()
+
+
+def recency_weight(created_at, now: datetime | None = None, half_life_days: float = RECENCY_HALF_LIFE_DAYS) -> float:
+    """Exponential decay: a doc `half_life_days` old weighs half of a brand new one."""
+    if not isinstance(created_at, datetime):
+        return 0.5
+    now = now or datetime.utcnow()
+    if created_at.tzinfo is not None:
+        created_at = created_at.replace(tzinfo=None)
+    age_days = max((now - created_at).total_seconds() / 86400.0, 0.0)
+    return max(0.5 ** (age_days / half_life_days), MIN_RECENCY_WEIGHT)
+
+
+def engagement_weight(item) -> float:
+    return 1.0 + math.log1p(max(item.save_count, 0))
+
+
+def weighted_sample(items, weights, k, rng=None):
+    """
+    Weighted sampling without replacement (Efraimidis-Spirakis).
+    Each item gets key u ** (1 / w); the k largest keys win.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.size == 0:
+        return []
+    rng = rng or _rng
+    keys = np.zeros(weights.size)
+    positive = weights > 0
+    keys[positive] = rng.random(int(positive.sum())) ** (1.0 / weights[positive])
+    keys[~positive] = -1.0
+    return [items[i] for i in top_k(keys, k) if keys[i] >= 0]
+
+
+def sample_documents(collection, query_filter, k, relevance=None, pool_size=SAMPLE_POOL_SIZE):
+    """
+    Draw `k` CatalogueItems from the whole set matching `query_filter` in a
+    single projected aggregation, weighted by recency, engagement and
+    (optionally) a `relevance(items)` callable returning one score per item.
+    """
+    pipeline = [
+        {"$match": query_filter or {}},
+        {"$sample": {"size": max(pool_size, k)}},
+        {"$project": CATALOGUE_PROJECTION},
+    ]
+    docs = catalogue_items(raw(collection).aggregate(pipeline))
+    if not docs:
+        return []
+
+    now = datetime.utcnow()
+    weights = np.array(
+        [recency_weight(item.created_at, now) * engagement_weight(item) for item in docs]
+    )
+    if relevance is not None:
+        weights *= np.asarray(relevance(docs), dtype=np.float64)
+    return weighted_sample(docs, weights, k)
@@ -0,0 +1,74 @@
+import numpy as np
+
+# --- Tag-overlap relevance scoring ---
+BASE_TAG_WEIGHT = 1.0
+SYNONYM_WEIGHT = 0.5
+
+
+def _clean(tag) -> str:
+    return str(tag).strip().lower() if isinstance(tag, str) else ""
+
+
+def build_vocabulary(docs, profile_tags) -> dict[str, int]:
+    """Map every tag seen in the candidate CatalogueItems or the profile to a column."""
+    vocab: dict[str, int] = {}
+    for tag in profile_tags:
+        vocab.setdefault(tag, len(vocab))
+    for doc in docs:
+        for tag in doc.tags:
+            text = _clean(tag)
+            if text:
+                vocab.setdefault(text, len(vocab))
+    return vocab
+
+
+def build_profile(base_tags, synonyms=None, weather_tag=None) -> dict[str, float]:
+    """
+    Weight per tag for a request: quiz tags and their synonyms. The weather
+    bucket is left out: callers filter on it, and as a scored tag it would let
+    weather-only matches through with no style or body shape overlap.
+    """
+    weather = _clean(weather_tag)
+    profile: dict[str, float] = {}
+    for tag in base_tags or []:
+        text = _clean(tag)
+        if not text or text == weather:
+            continue
+        profile[text] = max(profile.get(text, 0.0), BASE_TAG_WEIGHT)
+        for synonym in (synonyms or {}).get(text, []):
+            profile.setdefault(synonym, SYNONYM_WEIGHT)
+    profile.pop(weather, None)
+    return profile
+
+
+def tag_matrix(docs, vocab: dict[str, int]) -> np.ndarray:
+    """Boolean (docs x vocabulary) matrix: row i has a bit per tag of doc i."""
+    matrix = np.zeros((len(docs), len(vocab)), dtype=bool)
+    for row, doc in enumerate(docs):
+        columns = [vocab[text] for text in map(_clean, doc.tags) if text in vocab]
+        matrix[row, columns] = True
+    return matrix
+
+
+def score_documents(docs, profile: dict[str, float]) -> np.ndarray:
+    """Weighted tag overlap of every doc against the request profile, in one matmul."""
+    if not docs:
+        return np.zeros(0, dtype=np.float32)
+    if not profile:
+        return np.ones(len(docs), dtype=np.float32)
+    vocab = build_vocabulary(docs, profile)
+    weights = np.zeros(len(vocab), dtype=np.float32)
+    for tag, weight in profile.items():
+        weights[vocab[tag]] = weight
+    return tag_matrix(docs, vocab).astype(np.float32) @ weights
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without a full sort."""
+    if k <= 0 or scores.size == 0:
+        return np.zeros(0, dtype=np.intp)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
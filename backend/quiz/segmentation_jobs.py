@@ -0,0 +1,198 @@
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+from bson.binary import Binary
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+# --- Asynchronous segmentation jobs ---
+# /api/segment_jobs/ stores the upload in a Mongo-backed queue and returns a
+# job id at once. `manage.py run_segmentation_worker` processes (any number of)
+# jobs elsewhere: it claims one with a lease, so a crashed worker's job is
+# picked up again once the lease runs out (at most SEGMENT_JOB_MAX_ATTEMPTS
+# attempts in all, then it is failed), and writes the results to R2.
+SEGMENT_MAX_UPLOAD_BYTES = int(os.getenv("SEGMENT_MAX_UPLOAD_BYTES", str(8 * 1024 * 1024)))
+SEGMENT_JOB_LEASE_SECONDS = int(os.getenv("SEGMENT_JOB_LEASE_SECONDS", "300"))
+SEGMENT_JOB_MAX_ATTEMPTS = 3
+SEGMENT_JOB_RETENTION_DAYS = 7
+SEGMENT_WORKER_POLL_SECONDS = 1.0
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+_PUBLIC_FIELDS = {"image": 0, "lease_until": 0, "worker": 0}
+
+
+class SegmentationQueue:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index([("status", 1), ("created_at", 1)], name="status_created_at")
+        self.collection.create_index(
+            "finished_at", expireAfterSeconds=SEGMENT_JOB_RETENTION_DAYS * 86400, name="finished_at_ttl"
+        )
+
+    def submit(self, image_bytes: bytes, user_id=None) -> str:
+        now = datetime.utcnow()
+        result = self.collection.insert_one({
+            "status": QUEUED,
+            "image": Binary(image_bytes),
+            "user_id": user_id,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        })
+        return str(result.inserted_id)
+
+    def get(self, job_id: str) -> dict | None:
+        try:
+            object_id = ObjectId(job_id)
+        except (InvalidId, TypeError):
+            return None
+        return self.collection.find_one({"_id": object_id}, _PUBLIC_FIELDS)
+
+    def expire_abandoned(self, now: datetime | None = None) -> int:
+        """
+        Fail jobs whose lease expired on their last attempt: an image that
+        crashes or OOM-kills the worker never reaches fail(), so it stops here.
+        """
+        now = now or datetime.utcnow()
+        return self.collection.update_many(
+            {"status": RUNNING, "lease_until": {"$lt": now}, "attempts": {"$gte": SEGMENT_JOB_MAX_ATTEMPTS}},
+            {"$set": {"status": FAILED, "error": "Worker stopped while processing this image",
+                      "finished_at": now, "updated_at": now},
+             "$unset": {"image": "", "lease_until": ""}},
+        ).modified_count
+
+    def claim(self, worker: str) -> dict | None:
+        """Atomically take the oldest queued job, or one whose worker's lease expired with attempts left."""
+        now = datetime.utcnow()
+        self.expire_abandoned(now)
+        return self.collection.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED},
+                {"status": RUNNING, "lease_until": {"$lt": now}, "attempts": {"$lt": SEGMENT_JOB_MAX_ATTEMPTS}},
+            ]},
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker": worker,
+                    "lease_until": now + timedelta(seconds=SEGMENT_JOB_LEASE_SECONDS),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _leased(self, job: dict) -> dict:
+        """Filter matching the job only while this claim still holds its lease."""
+        return {"_id": job["_id"], "status": RUNNING, "worker": job["worker"], "attempts": job["attempts"]}
+
+    def complete(self, job: dict, result: dict) -> bool:
+        """Store the result; False when the lease was lost (another worker re-claimed the job)."""
+        now = datetime.utcnow()
+        return self.collection.update_one(
+            self._leased(job),
+            {"$set": {"status": DONE, "result": result, "finished_at": now, "updated_at": now},
+             "$unset": {"image": "", "lease_until": ""}},
+        ).matched_count > 0
+
+    def fail(self, job: dict, error: str) -> bool:
+        """Requeue (or finally fail) the job; False when the lease was lost."""
+        now = datetime.utcnow()
+        if job.get("attempts", 0) >= SEGMENT_JOB_MAX_ATTEMPTS:
+            update = {"$set": {"status": FAILED, "error": error, "finished_at": now, "updated_at": now},
+                      "$unset": {"image": "", "lease_until": ""}}
+        else:
+            update = {"$set": {"status": QUEUED, "error": error, "updated_at": now}, "$unset": {"lease_until": ""}}
+        return self.collection.update_one(self._leased(job), update).matched_count > 0
+
+
+def job_to_json(job: dict) -> dict:
+    payload = {
+        "job_id": str(job["_id"]),
+        "status": job.get("status"),
+        "created_at": job.get("created_at"),
+        "finished_at": job.get("finished_at"),
+    }
+    if job.get("status") == DONE:
+        payload["result"] = job.get("result")
+    if job.get("error"):
+        payload["error"] = job["error"]
+    return payload
+
+
+def process_job(job: dict, uploader) -> dict:
+    """
+    Segment the job's image and upload every output in one parallel batch;
+    returns the stored result. `items` can be posted to /api/save_images/ as is.
+    """
+    from .detectron2_helpers import segment_items
+
+    segmented = segment_items(bytes(job["image"]))
+    prefix = f"segmentation/{job['_id']}"
+    uploads = [(f"{prefix}/visualization.jpg", segmented["overlay"]), (f"{prefix}/masks.png", segmented["label_map"])]
+    uploads += [(f"{prefix}/item_{item['label']}.png", item["thumbnail"]) for item in segmented["items"]]
+    urls = uploader.upload_many(uploads)
+
+    items = []
+    for item, (filename, _), url in zip(segmented["items"], uploads[2:], urls[2:]):
+        if not url:
+            continue
+        items.append({
+            "filename": filename,
+            "image_url": url,
+            "tags": item["tags"],
+            "class_id": item["class_id"],
+            "bbox": item["bbox"],
+            "area": item["area"],
+        })
+    return {
+        "num_items": len(items),
+        "visualization_url": urls[0],
+        "masks_url": urls[1],
+        "items": items,
+    }
+
+
+def run_worker(queue: SegmentationQueue, uploader, once: bool = False, poll_seconds: float = SEGMENT_WORKER_POLL_SECONDS,
+               log=print) -> int:
+    """Process jobs until stopped (or until the queue is empty when `once`); returns jobs handled."""
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    handled = 0
+    while True:
+        try:
+            job = queue.claim(worker)
+        except PyMongoError as exc:
+            log(f"[DEBUG] Could not claim segmentation job: {exc}")
+            job = None
+        if job is None:
+            if once:
+                return handled
+            time.sleep(poll_seconds)
+            continue
+
+        started = time.monotonic()
+        try:
+            try:
+                result = process_job(job, uploader)
+            except Exception as exc:
+                log(f"[DEBUG] Segmentation job {job['_id']} failed: {exc}")
+                recorded = queue.fail(job, str(exc))
+            else:
+                recorded = queue.complete(job, result)
+                if recorded:
+                    log(f"[DEBUG] Segmentation job {job['_id']} done in {time.monotonic() - started:.1f}s")
+        except PyMongoError as exc:
+            # Left running; it is retried once the lease runs out
+            log(f"[DEBUG] Could not record segmentation job {job['_id']}: {exc}")
+            recorded = True
+        if not recorded:
+            # The lease ran out mid-job and another worker owns it now; its outcome wins
+            log(f"[DEBUG] Segmentation job {job['_id']} lost its lease, discarding this attempt")
+        handled += 1
@@ -31,7 +31,7 @@ def clean_tags(tags):
     return cleaned
 
 def main():
-    all_images = list(collection.find({}))
+    all_images = list(collection.find({}, {"filename": 1, "tags": 1}))
     print(f"Found {len(all_images)} images in DB")
 
     for img in all_images:
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from .read_models import CATALOGUE_PROJECTION, catalogue_items, raw
+from .sampling import engagement_weight, recency_weight, weighted_sample
+from .scoring import build_profile, build_vocabulary, tag_matrix, top_k
+
+# --- Precomputed recommendation slates ---
+# Every few minutes the catalogue is scored once against the most requested
+# (collection, style/body shape/weather tags) profiles. recommend samples from
+# the ready slate and only queries Mongo live on a miss.
+SLATE_REFRESH_SECONDS = 300
+SLATE_SIZE = 200
+SLATE_MAX_PROFILES = 64
+SLATE_CATALOGUE_LIMIT = 20000
+
+
+class Slate:
+    """Positions into a collection's CatalogueItem list (or snapshot table) plus their sampling weights."""
+
+    __slots__ = ("docs", "positions", "weights", "built_at")
+
+    def __init__(self, docs: list, positions: np.ndarray, weights: np.ndarray):
+        self.docs = docs
+        self.positions = positions
+        self.weights = weights
+        self.built_at = time.time()
+
+    def sample(self, k: int) -> list:
+        return [self.docs[pos] for pos in weighted_sample(self.positions.tolist(), self.weights, k)]
+
+
+class SlateStore:
+    def __init__(self, synonyms_provider, refresh_seconds: int = SLATE_REFRESH_SECONDS, snapshot_provider=None):
+        self.synonyms_provider = synonyms_provider
+        # Optional CatalogueSnapshot source; slates then index the shared memory-mapped table
+        self.snapshot_provider = snapshot_provider
+        self.refresh_seconds = refresh_seconds
+        self._slates: dict[tuple, Slate] = {}
+        self._demand: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(collection_name: str, tags) -> tuple:
+        return (collection_name, tuple(sorted(set(tags))))
+
+    def get(self, collection_name: str, tags, weather_tag=None) -> Slate | None:
+        """Ready slate for this profile, or None. Every call counts as demand for the next build."""
+        key = self.make_key(collection_name, tags)
+        with self._lock:
+            self._demand[(key, weather_tag)] += 1
+            return self._slates.get(key)
+
+    @staticmethod
+    def _slate(docs, scores: np.ndarray) -> Slate:
+        """Keep the SLATE_SIZE best rows by relevance x (recency x engagement) prior, weighted by that score."""
+        positions = top_k(scores, SLATE_SIZE)
+        positions = positions[scores[positions] > 0]
+        return Slate(docs, positions.astype(np.int32), scores[positions].astype(np.float32))
+
+    def build(self, get_collection) -> int:
+        with self._lock:
+            wanted = [profile for profile, _ in self._demand.most_common(SLATE_MAX_PROFILES)]
+            self._demand = Counter({profile: 1 for profile in wanted})
+
+        by_collection: dict[str, list] = {}
+        for (collection_name, tags), weather_tag in wanted:
+            by_collection.setdefault(collection_name, []).append((tags, weather_tag))
+
+        synonyms = self.synonyms_provider()
+        slates: dict[tuple, Slate] = {}
+        now = datetime.utcnow()
+        snapshot = self.snapshot_provider() if self.snapshot_provider else None
+        for collection_name, profiles in by_collection.items():
+            table = snapshot.table(collection_name) if snapshot is not None else None
+            if table is not None:
+                prior = table.prior()
+                for tags, weather_tag in profiles:
+                    scores = table.relevance(build_profile(tags, synonyms, weather_tag)) * prior
+                    if weather_tag:  # the weather bucket is a hard filter, as in recommend's live query
+                        scores *= table.relevance({weather_tag: 1.0}) > 0
+                    slates[(collection_name, tags)] = self._slate(table, scores)
+                continue
+
+            docs = catalogue_items(
+                raw(get_collection(collection_name))
+                .find({}, CATALOGUE_PROJECTION)
+                .sort("created_at", -1)
+                .limit(SLATE_CATALOGUE_LIMIT)
+            )
+            if not docs:
+                continue
+            vocab = build_vocabulary(docs, [])
+            matrix = tag_matrix(docs, vocab).astype(np.float32)
+            prior = np.array([recency_weight(item.created_at, now) * engagement_weight(item) for item in docs])
+            for tags, weather_tag in profiles:
+                profile = build_profile(tags, synonyms, weather_tag)
+                weights = np.zeros(len(vocab), dtype=np.float32)
+                for tag, weight in profile.items():
+                    if tag in vocab:
+                        weights[vocab[tag]] = weight
+                scores = (matrix @ weights) * prior
+                if weather_tag:
+                    scores *= matrix[:, vocab[weather_tag]] if weather_tag in vocab else 0.0
+                slates[(collection_name, tags)] = self._slate(docs, scores)
+
+        with self._lock:
+            self._slates = slates
+        return len(slates)
+
+    def start(self, get_collection) -> None:
+        def _loop():
+            while True:
+                time.sleep(self.refresh_seconds)
+                try:
+                    count = self.build(get_collection)
+                    print(f"[DEBUG] Rebuilt {count} recommendation slates")
+                except Exception as exc:
+                    print(f"[DEBUG] Slate build failed: {exc}")
+
+        threading.Thread(target=_loop, daemon=True, name="slate-builder").start()
@@ -0,0 +1,53 @@
+import base64
+import json
+import tracemalloc
+
+from django.test import SimpleTestCase
+
+from .buffers import B64_CHUNK_BYTES, ImageBuffer
+from .responses import StreamingOutfitsResponse
+
+
+class StreamingOutfitsResponseTests(SimpleTestCase):
+    IMAGE_COUNT = 4
+    IMAGE_BYTES = 2 * 1024 * 1024
+
+    def _entries(self):
+        return [
+            ({"name": f"outfit-{index}", "tags": ["casual"]}, ImageBuffer(bytes([index]) * self.IMAGE_BYTES))
+            for index in range(self.IMAGE_COUNT)
+        ]
+
+    def test_streams_valid_payload(self):
+        entries = self._entries()
+        body = b"".join(StreamingOutfitsResponse(entries, extra={"errors": []}).streaming_content)
+        payload = json.loads(body)
+
+        self.assertEqual(payload["errors"], [])
+        self.assertEqual(len(payload["outfits"]), self.IMAGE_COUNT)
+        for (fields, buffer), outfit in zip(entries, payload["outfits"]):
+            self.assertEqual(outfit["name"], fields["name"])
+            prefix, encoded = outfit["image"].split(",", 1)
+            self.assertEqual(prefix, "data:image/png;base64")
+            self.assertEqual(base64.b64decode(encoded), buffer.view.tobytes())
+
+    def test_peak_allocation_stays_bounded(self):
+        """Streaming must never hold an image's (or the whole response's) base64 copy in memory."""
+        entries = self._entries()
+        response = StreamingOutfitsResponse(entries)
+
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            streamed = 0
+            for chunk in response.streaming_content:
+                streamed += len(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        encoded_total = self.IMAGE_COUNT * (self.IMAGE_BYTES * 4 // 3)
+        self.assertGreater(streamed, encoded_total)
+        # A few base64 chunks in flight at most; one whole encoded image would be ~2.7 MB
+        self.assertLess(peak - baseline, 8 * B64_CHUNK_BYTES)
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import quote
+
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+
+from .buffers import as_reader
+
+# --- R2 upload engine ---
+R2_UPLOAD_WORKERS = int(os.getenv("R2_UPLOAD_WORKERS", "8"))
+R2_UPLOAD_ATTEMPTS = int(os.getenv("R2_UPLOAD_ATTEMPTS", "4"))
+R2_RETRY_BASE_DELAY = 0.5
+R2_SPOOL_DIR = os.getenv("R2_SPOOL_DIR", os.path.join(settings.BASE_DIR, "data", "r2_spool"))
+R2_SPOOL_DRAIN_INTERVAL = 60
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+    use_threads=True,
+)
+
+
+class R2Uploader:
+    """
+    Uploads to R2 on a shared, bounded thread pool with exponential-backoff
+    retries. Uploads that still fail are spooled to disk and retried by a
+    background drainer; callers get None for them and must not record or serve
+    the URL yet. A JSON-serialisable `pending` payload (the metadata the caller
+    would have saved) is spooled with the bytes and handed to
+    `on_drained(url, file_bytes, pending)` once the drainer gets the upload
+    through, so the image is recorded then instead of being lost.
+    """
+
+    def __init__(self, s3_client, bucket: str, public_url_base: str, workers: int = R2_UPLOAD_WORKERS,
+                 attempts: int = R2_UPLOAD_ATTEMPTS, spool_dir: str = R2_SPOOL_DIR, on_drained=None):
+        self.s3 = s3_client
+        self.on_drained = on_drained
+        self.bucket = bucket
+        self.public_url_base = public_url_base
+        self.attempts = max(1, attempts)
+        self.spool_dir = spool_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="r2-upload")
+        # Caps queued + running uploads; callers block instead of piling up memory
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._drainer_started = False
+        self._drainer_lock = threading.Lock()
+        if os.path.isdir(spool_dir) and os.listdir(spool_dir):
+            # Leftovers from a previous process
+            self._start_drainer()
+
+    def public_url(self, filename: str) -> str:
+        return f"{self.public_url_base}{quote(filename, safe='-_.')}"
+
+    def _put(self, filename: str, file_bytes) -> None:
+        self.s3.upload_fileobj(as_reader(file_bytes), self.bucket, filename, Config=TRANSFER_CONFIG)
+
+    def _put_with_retries(self, filename: str, file_bytes) -> bool:
+        for attempt in range(self.attempts):
+            try:
+                self._put(filename, file_bytes)
+                return True
+            except (BotoCoreError, ClientError) as exc:
+                print(f"Upload attempt {attempt + 1}/{self.attempts} failed for {filename}: {exc}")
+                if attempt + 1 < self.attempts:
+                    time.sleep(R2_RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.random()))
+        return False
+
+    def upload(self, filename: str, file_bytes, pending: dict | None = None) -> str | None:
+        """
+        Upload synchronously. Returns the public URL once the object is in R2,
+        None otherwise (also when it was spooled: the URL 404s until the drainer
+        gets it through, so it must not be saved or served).
+        """
+        if not file_bytes:
+            return None
+        if self._put_with_retries(filename, file_bytes):
+            return self.public_url(filename)
+        self._spool(filename, file_bytes, pending)
+        return None
+
+    def submit(self, filename: str, file_bytes, on_success=None, pending: dict | None = None) -> Future:
+        """Queue an upload on the shared pool; `on_success(url)` runs on the worker thread."""
+        self._slots.acquire()
+
+        def _run():
+            try:
+                url = self.upload(filename, file_bytes, pending)
+                if url and on_success is not None:
+                    on_success(url)
+                return url
+            finally:
+                self._slots.release()
+
+        try:
+            return self.executor.submit(_run)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def upload_many(self, items) -> list[str | None]:
+        """Upload (filename, bytes) pairs in parallel, returning URLs in input order."""
+        futures = [self.submit(filename, file_bytes) for filename, file_bytes in items]
+        return [future.result() for future in futures]
+
+    # --- Disk spool ---
+    def _write_meta(self, meta_path: str, meta: dict) -> None:
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_path, meta_path)
+
+    def _spool(self, filename: str, file_bytes, pending: dict | None = None) -> bool:
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            key = hashlib.sha1(filename.encode("utf-8")).hexdigest()
+            data_path = os.path.join(self.spool_dir, f"{key}.bin")
+            meta_path = os.path.join(self.spool_dir, f"{key}.json")
+            tmp_path = f"{data_path}.tmp"
+            with open(tmp_path, "wb") as fh:
+                fh.write(file_bytes)
+            os.replace(tmp_path, data_path)
+            # The .json is written last: drain_spool only picks up complete entries
+            self._write_meta(meta_path, {"filename": filename, "pending": pending, "uploaded": False})
+        except (OSError, TypeError, ValueError) as exc:
+            print(f"Could not spool failed upload {filename}: {exc}")
+            return False
+        print(f"Spooled failed upload {filename} for retry")
+        self._start_drainer()
+        return True
+
+    def drain_spool(self) -> int:
+        """
+        Retry every spooled upload once, then record it through `on_drained`.
+        An entry whose upload worked but whose record failed is kept (marked
+        uploaded) and only the record is retried next time.
+        """
+        try:
+            entries = [name for name in os.listdir(self.spool_dir) if name.endswith(".json")]
+        except OSError:
+            return 0
+        uploaded = 0
+        for entry in entries:
+            meta_path = os.path.join(self.spool_dir, entry)
+            data_path = meta_path[:-len(".json")] + ".bin"
+            try:
+                with open(meta_path, "r") as fh:
+                    meta = json.load(fh)
+                filename = meta["filename"]
+                with open(data_path, "rb") as fh:
+                    file_bytes = fh.read()
+            except (OSError, ValueError, KeyError):
+                continue
+            if not meta.get("uploaded"):
+                if not self._put_with_retries(filename, file_bytes):
+                    continue
+                uploaded += 1
+            if meta.get("pending") and self.on_drained is not None:
+                try:
+                    self.on_drained(self.public_url(filename), file_bytes, meta["pending"])
+                except Exception as exc:
+                    print(f"Could not record drained upload {filename}: {exc}")
+                    try:
+                        self._write_meta(meta_path, {**meta, "uploaded": True})
+                    except OSError:
+                        pass
+                    continue
+            for path in (data_path, meta_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return uploaded
+
+    def _start_drainer(self) -> None:
+        with self._drainer_lock:
+            if self._drainer_started:
+                return
+            self._drainer_started = True
+
+        def _loop():
+            while True:
+                time.sleep(R2_SPOOL_DRAIN_INTERVAL)
+                try:
+                    self.drain_spool()
+                except Exception as exc:
+                    print(f"R2 spool drain failed: {exc}")
+
+        threading.Thread(target=_loop, daemon=True, name="r2-spool-drain").start()
@@ -0,0 +1,125 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+# --- User lookups on one normalised login key ---
+# Every user document carries `login_key` (NFKC-normalised, casefolded email or
+# legacy username) under a unique index: logins are one point query and
+# signups are one insert that the index rejects when the key is taken.
+USER_NEGATIVE_CACHE_TTL = 30
+USER_NEGATIVE_CACHE_MAX = 10000
+USER_MIGRATION_BATCH = 500
+
+
+def normalize_login(value) -> str:
+    if not isinstance(value, str):
+        return ""
+    return unicodedata.normalize("NFKC", value).strip().casefold()
+
+
+class UserStore:
+    def __init__(self, collection):
+        self.collection = collection
+        # Keys recently found absent: repeated signup availability checks skip Mongo.
+        # Only signups read it; a stale entry just means the insert hits the unique index.
+        self._absent: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._migrated = False
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index(
+            "login_key",
+            unique=True,
+            name="login_key_unique",
+            partialFilterExpression={"login_key": {"$type": "string"}},
+        )
+
+    def migrate_login_keys(self, batch_size: int = USER_MIGRATION_BATCH) -> tuple[int, list]:
+        """
+        Backfill `login_key` on documents created before it existed. Returns
+        (updated, conflicts); a conflict is a user whose key another user already
+        holds (e.g. legacy usernames differing only in case) and needs a manual merge.
+        """
+        updated = 0
+        conflicts = []
+        last_id = None
+        while True:
+            query = {"login_key": {"$exists": False}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            docs = list(self.collection.find(query, {"_id": 1, "email": 1, "username": 1}).sort("_id", 1).limit(batch_size))
+            if not docs:
+                break
+            last_id = docs[-1]["_id"]
+            ids, operations = [], []
+            for doc in docs:
+                key = normalize_login(doc.get("email") or doc.get("username"))
+                if key:
+                    ids.append(doc["_id"])
+                    operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"login_key": key}}))
+            if not operations:
+                continue
+            try:
+                updated += self.collection.bulk_write(operations, ordered=False).modified_count
+            except BulkWriteError as exc:
+                updated += exc.details.get("nModified", 0)
+                conflicts += [ids[error["index"]] for error in exc.details.get("writeErrors", [])]
+        self._migrated = True
+        return updated, conflicts
+
+    def _is_absent(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._absent.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._absent[key]
+                return False
+            return True
+
+    def _remember_absent(self, key: str) -> None:
+        with self._lock:
+            self._absent[key] = time.monotonic() + USER_NEGATIVE_CACHE_TTL
+            self._absent.move_to_end(key)
+            while len(self._absent) > USER_NEGATIVE_CACHE_MAX:
+                self._absent.popitem(last=False)
+
+    def _forget_absent(self, key: str) -> None:
+        with self._lock:
+            self._absent.pop(key, None)
+
+    def find(self, login, projection=None) -> dict | None:
+        key = normalize_login(login)
+        if not key:
+            return None
+        user = self.collection.find_one({"login_key": key}, projection)
+        if user is None and not self._migrated:
+            # Documents not backfilled yet (migration still running at startup)
+            user = self.collection.find_one({"$or": [{"email": login}, {"username": login}]}, projection)
+        return user
+
+    def is_available(self, login) -> bool:
+        key = normalize_login(login)
+        if not key:
+            return False
+        if self._is_absent(key):
+            return True
+        if self.find(login, {"_id": 1}) is not None:
+            return False
+        self._remember_absent(key)
+        return True
+
+    def create(self, login, fields: dict):
+        """Insert a user; returns the new id, or None when the login is taken (unique index)."""
+        key = normalize_login(login)
+        try:
+            result = self.collection.insert_one({**fields, "login_key": key})
+        except DuplicateKeyError:
+            return None
+        finally:
+            self._forget_absent(key)
+        return result.inserted_id
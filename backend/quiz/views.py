@@ -1,18 +1,20 @@
-import os, json, random, string, io, base64, re, requests
-from urllib.parse import quote
+import os, json, random, string, base64, re, requests
+from functools import partial
+from urllib.parse import quote, unquote, urlsplit
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
-from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.auth.hashers import make_password
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 import time
 from datetime import datetime, timedelta
 import jwt
 from django.conf import settings
+from django.db import DatabaseError, connections
 from google import genai
 import threading
 import boto3
@@ -26,12 +28,34 @@ except ModuleNotFoundError as exc:
     visualise_masks = None
     _SEGMENTATION_AVAILABLE = False
     _SEGMENTATION_IMPORT_ERROR = exc
-from botocore.exceptions import BotoCoreError, ClientError
+from .sampling import sample_documents
+from .scoring import build_profile, score_documents
+from .mongo import primary_client, read_client
+from .embeddings import embedding_index
+from .read_models import (
+    GENERATED_PROJECTION, USER_AUTH_PROJECTION, WARDROBE_PROJECTION, WardrobeItem, catalogue_items, raw,
+)
+from .uploads import R2Uploader
+from .responses import FastJsonResponse, StreamingOutfitsResponse, compressed
+from .buffers import ImageBuffer
+from .result_cache import QueryResultCache
+from .models import OutfitCache, prune_old_outfits
+from .vocabulary import canonical_tag, expand_tags, get_vocabulary
+from .hashing import HashingBusy, HashingRateLimited, password_hasher
+from .slates import SlateStore
+from .catalogue_snapshot import SnapshotManager
+from .federation import content_hash, federated_candidates
+from .circuit import CircuitBreakers, CircuitOpen
+from .admission import AdmissionController
+from .profiling import profiled
+from .wardrobe_index import WardrobeMembership
+from .users import UserStore
+from .wardrobe import ensure_wardrobe_indexes
+from .segmentation_jobs import SEGMENT_MAX_UPLOAD_BYTES, SegmentationQueue, job_to_json
 
 load_dotenv()
 
 # --- Mongo & R2 setup ---
-MONGO_URI = os.getenv("MONGO_URI")
 ACCOUNT_ID = os.getenv("CF_ACCOUNT_ID")
 ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
 SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
@@ -39,12 +63,26 @@ BUCKET = os.getenv("R2_BUCKET")
 PUBLIC_URL_BASE = os.getenv("PUBLIC_URL_BASE")
 GENAI_API_KEY = os.getenv("GENAI_API_KEY")
 
-client = MongoClient(MONGO_URI)
+client = primary_client
 images_db = client["outfits"]
 collection = images_db["images"]
 instant_collection = images_db["instantoutfit"]
 users_db = client["users_db"]
 users_collection = users_db["users"]
+user_store = UserStore(users_collection)
+
+# Catalogue reads (recommend) may hit secondaries. get_generated_images stays on the
+# primary because its write-through cache would pin a lagging result, and
+# get_wardrobe does too so a user sees an outfit right after saving it.
+read_images_db = read_client["outfits"]
+read_collection = read_images_db["images"]
+
+# Sources a federated recommend may fan out to. Saved wardrobe rows are not one:
+# other users' rows must never be served, and recommend skips the caller's own.
+FEDERATED_SOURCES = {
+    "images": read_collection,
+    "instantoutfit": read_images_db["instantoutfit"],
+}
 
 s3 = boto3.client(
     's3',
@@ -53,26 +91,50 @@ s3 = boto3.client(
     aws_secret_access_key=SECRET_ACCESS_KEY
 )
 
-genai_client = genai.Client(api_key=GENAI_API_KEY)
+# Uploads spooled while R2 is down are recorded by finish_spooled_upload once they go through
+r2_uploader = R2Uploader(
+    s3, BUCKET, PUBLIC_URL_BASE, on_drained=lambda *args: finish_spooled_upload(*args)
+)
+
+# Durable queue drained by `manage.py run_segmentation_worker`
+segmentation_queue = SegmentationQueue(images_db["segmentation_jobs"])
+
+GENAI_IMAGE_MODEL = "gemini-2.5-flash-image-preview"
+GENAI_TIMEOUT_SECONDS = int(os.getenv("GENAI_TIMEOUT_SECONDS", "60"))
+genai_client = genai.Client(api_key=GENAI_API_KEY, http_options={"timeout": GENAI_TIMEOUT_SECONDS * 1000})
+genai_breakers = CircuitBreakers("genai")
 TOTAL_IMAGES = 20
 
+# Repeat quiz answers hit this instead of Mongo; new AI images invalidate it
+generated_images_cache = QueryResultCache("generated_images")
+
 # --- Helpers ---
-fashion_synonyms = {
-    "dress": ["gown", "cocktail dress", "evening wear"],
-    "red": ["scarlet", "crimson", "burgundy"],
-    "jacket": ["blazer", "coat", "cardigan"],
-    "shirt": ["top", "blouse", "tee"],
-    "pants": ["trousers", "slacks", "leggings"],
-    "shoes": ["sneakers", "heels", "boots"]
-}
+def generate_image_content(prompt_text: str, model: str = GENAI_IMAGE_MODEL):
+    """Gemini call through the model's circuit breaker; raises CircuitOpen without calling when it is open."""
+    return genai_breakers.get(model).call(
+        genai_client.models.generate_content,
+        model=model,
+        contents=[prompt_text],
+    )
+
+def catalogue_fallback(tags, count: int) -> list:
+    """Catalogue images matching `tags` (any other images if too few), served while Gemini is down."""
+    tags = [tag for tag in tags if tag]
+    profile = build_profile(tags)
+    items = sample_documents(
+        read_collection,
+        {"tags": {"$in": list(profile)}} if profile else {},
+        count,
+        relevance=(lambda docs: score_documents(docs, profile)) if profile else None,
+    )
+    if len(items) < count:
+        seen = {item.filename for item in items}
+        items += [item for item in sample_documents(read_collection, {}, count) if item.filename not in seen]
+    return items[:count]
 
 def expand_queries(keywords):
-    expanded = []
-    for term in keywords:
-        expanded.append(term.lower())
-        if term.lower() in fashion_synonyms:
-            expanded.extend(fashion_synonyms[term.lower()])
-    return list(set(expanded))
+    """Keywords plus synonyms from quiz/vocabulary.json (memoized per tag set)."""
+    return list(expand_tags(keywords))
 
 def _normalize_to_list(value):
     if value is None:
@@ -97,6 +159,30 @@ def _collect_values(data, *keys):
 def safe_filename(name: str) -> str:
     return quote(name, safe='-_.')  
 
+SIMILAR_FETCH_MAX_BYTES = 8 * 1024 * 1024
+
+def fetch_public_image(url: str, max_bytes: int = SIMILAR_FETCH_MAX_BYTES) -> bytes | None:
+    """Download an image we host ourselves (under PUBLIC_URL_BASE), at most `max_bytes`; None otherwise."""
+    if not PUBLIC_URL_BASE or not isinstance(url, str):
+        return None
+    base, target = urlsplit(PUBLIC_URL_BASE), urlsplit(url)
+    if (target.scheme, target.netloc) != (base.scheme, base.netloc) or not target.path.startswith(base.path):
+        return None
+    try:
+        with requests.get(url, timeout=5, stream=True, allow_redirects=False) as response:
+            response.raise_for_status()
+            if int(response.headers.get("Content-Length") or 0) > max_bytes:
+                return None
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                body += chunk
+                if len(body) > max_bytes:
+                    return None
+            return bytes(body)
+    except (requests.RequestException, ValueError) as exc:
+        print(f"[DEBUG] Could not fetch {url}: {exc}")
+        return None
+
 def get_weather_bucket(city: str = "Sydney") -> dict[str, object] | None:
     api_key = os.getenv("WEATHER_API")
     if not api_key:
@@ -137,24 +223,112 @@ PASSWORD_REQUIREMENTS = re.compile(
     r"^(?=.*[A-Z])(?=.*[!@#$%^&*(),.?\":{}|<>\\/~`_\[\]\-+=]).{8,}$"
 )
 
+# Reverse proxies in front of Django that append to X-Forwarded-For (0: trust none, use REMOTE_ADDR)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+_proxy_hops_warned = False
+
+def client_ip(request) -> str | None:
+    """
+    Client address for quotas. The leftmost X-Forwarded-For entries are whatever
+    the client sent, so only the one added by our outermost trusted proxy counts.
+    """
+    global _proxy_hops_warned
+    forwarded_header = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    if TRUSTED_PROXY_HOPS > 0:
+        forwarded = [part.strip() for part in forwarded_header.split(",")]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS and forwarded[-TRUSTED_PROXY_HOPS]:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    elif forwarded_header and not _proxy_hops_warned:
+        _proxy_hops_warned = True
+        print("[WARNING] X-Forwarded-For is set but TRUSTED_PROXY_HOPS=0: every client behind the "
+              "proxy shares one per-IP quota. Set TRUSTED_PROXY_HOPS to the number of proxies in front of Django.")
+    return request.META.get("REMOTE_ADDR")
+
+def request_identity(request) -> str:
+    """Quota key: the JWT user when the token is valid, else the client address."""
+    token = get_auth_token(request)
+    decoded = decode_jwt(token) if token else None
+    if decoded and decoded.get("user_id"):
+        return f"user:{decoded['user_id']}"
+    return f"ip:{client_ip(request) or 'unknown'}"
+
+# Token buckets and concurrency caps for generate / instant vibe / segment
+admission = AdmissionController(lambda request: request_identity(request))
+
+def hashing_busy_response(exc: HashingBusy) -> JsonResponse:
+    if isinstance(exc, HashingRateLimited):
+        response = JsonResponse({"error": "Too many attempts, slow down."}, status=429)
+    else:
+        response = JsonResponse({"error": "Server busy, please retry."}, status=503)
+    response["Retry-After"] = "1"
+    return response
+
 def is_valid_password(password: str) -> bool:
     if not isinstance(password, str):
         return False
     return bool(PASSWORD_REQUIREMENTS.match(password))
 
-def upload_to_r2(filename: str, file_bytes: bytes) -> str:
-    if not file_bytes:
-        return None
+def cached_prompt(query: str):
+    """Fresh OutfitCache entry for a normalized prompt, or None (also when the DB is down)."""
     try:
-        s3.upload_fileobj(io.BytesIO(file_bytes), BUCKET, filename)
-        return f"{PUBLIC_URL_BASE}{safe_filename(filename)}"
-    except (BotoCoreError, ClientError) as e:
-        print(f"Upload failed for {filename}: {e}")
+        return OutfitCache.lookup(query)
+    except DatabaseError as exc:
+        print(f"[DEBUG] Outfit cache lookup failed for '{query}': {exc}")
         return None
 
-def save_image_metadata(filename: str, keywords: list, r2_url: str, user_id=None):
+def remember_prompt(query: str, uploads, tags: list[str]) -> None:
+    """Record finished uploads (URLs or futures) for a prompt in the OutfitCache."""
+    try:
+        urls = [upload.result() if hasattr(upload, "result") else upload for upload in uploads]
+        OutfitCache.remember(query, urls, tags)
+    except Exception as exc:
+        print(f"[DEBUG] Could not cache outfits for '{query}': {exc}")
+
+def background_task(fn):
+    """
+    Wrap a thread body so it closes the DB connections its thread opened.
+    Only for code off the request path: on a request thread close_all would
+    drop the connection the request is still using.
+    """
+    def _run(*args):
+        try:
+            return fn(*args)
+        finally:
+            connections.close_all()
+
+    return _run
+
+def _schedule_outfit_cache_pruning(interval_seconds: int = 6 * 60 * 60) -> None:
+    def _loop():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                print(f"[DEBUG] Pruned {prune_old_outfits()} outfit cache entries")
+            except Exception as exc:
+                print(f"[DEBUG] Outfit cache pruning failed: {exc}")
+            finally:
+                connections.close_all()
+
+    threading.Thread(target=_loop, daemon=True, name="outfit-cache-prune").start()
+
+# Catalogue columns shared by all workers through one memory-mapped file
+catalogue_snapshots = SnapshotManager(lambda name: read_images_db[name], ["images", "instantoutfit"])
+
+# Ready-to-serve candidates per (collection, quiz tags incl. weather bucket)
+slate_store = SlateStore(lambda: get_vocabulary().synonyms, snapshot_provider=catalogue_snapshots.current)
+
+def upload_to_r2(filename: str, file_bytes: bytes, pending: dict | None = None) -> str | None:
+    """
+    Blocking upload with retries; None if it failed. The bytes are then spooled
+    and retried later, and `pending` (see finish_spooled_upload) is recorded
+    when they go through.
+    """
+    return r2_uploader.upload(filename, file_bytes, pending)
+
+def save_image_metadata(filename: str, keywords: list, r2_url: str, user_id=None, image_bytes=None, extra_fields=None):
     """
     Save image metadata and ensure all keywords are included as tags.
+    When the raw bytes are passed, the image is also added to the embedding index.
     """
     # Lowercase and deduplicate
     tags = list(set([k.lower() for k in keywords if k]))
@@ -171,9 +345,73 @@ def save_image_metadata(filename: str, keywords: list, r2_url: str, user_id=None
         "source_url": r2_url,
         "user_id": user_id
     }
+    if image_bytes:
+        doc["content_hash"] = content_hash(image_bytes)
+    if extra_fields:
+        doc.update(extra_fields)
     collection.insert_one(doc)
+    generated_images_cache.invalidate(tags)
+    if image_bytes:
+        embedding_index.add(filename, r2_url, image_bytes)
+
+def save_to_wardrobe(user_id: str, filename: str, image_url: str, tags: list) -> None:
+    try:
+        wardrobe_collection.insert_one({
+            "user_id": user_id,
+            "filename": filename,
+            "image_url": image_url,
+            "tags": tags,
+            "saved_at": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        return
+    wardrobe_membership.add(user_id, [filename, image_url])
+
+def instant_document(filename: str, r2_url: str, image_bytes, tag: str, prompt: str, vibe: str) -> dict:
+    return {
+        "filename": filename,
+        "tags": [tag],
+        "created_at": datetime.utcnow(),
+        "images": {"full": r2_url, "thumbnail": r2_url},
+        "source_url": r2_url,
+        "collection": "instantoutfit",
+        "is_ai": True,
+        "prompt": prompt,
+        "seed_source": f"generate_instant_vibe::{vibe}",
+        "vibe": vibe,
+        "content_hash": content_hash(image_bytes),
+    }
+
+def finish_spooled_upload(r2_url: str, image_bytes: bytes, pending: dict) -> None:
+    """
+    Write the metadata a caller skipped because its upload was spooled. `pending`
+    is {"kind": "image", "filename", "tags", "user_id", "extra_fields", "wardrobe_user_id"}
+    or {"kind": "instant", "filename", "tag", "prompt", "vibe"}. Safe to repeat.
+    """
+    filename = pending["filename"]
+    if pending.get("kind") == "instant":
+        if not instant_collection.find_one({"filename": filename}, {"_id": 1}):
+            instant_collection.insert_one(instant_document(
+                filename, r2_url, image_bytes, pending["tag"], pending["prompt"], pending["vibe"]
+            ))
+        embedding_index.add(filename, r2_url, image_bytes)
+        return
+
+    if not collection.find_one({"filename": filename}, {"_id": 1}):
+        save_image_metadata(
+            filename,
+            pending.get("tags") or [],
+            r2_url,
+            user_id=pending.get("user_id"),
+            image_bytes=image_bytes,
+            extra_fields=pending.get("extra_fields"),
+        )
+    if pending.get("wardrobe_user_id"):
+        save_to_wardrobe(pending["wardrobe_user_id"], filename, r2_url, pending.get("tags") or [])
+    print(f"[DEBUG] Recorded spooled upload {filename}")
 
 @csrf_exempt
+@admission.limit("segment")
 def upload_and_segment(request):
     if request.method != "POST":
         return JsonResponse({"error": "POST required"}, status=400)
@@ -200,6 +438,56 @@ def upload_and_segment(request):
         "visualization": f"data:image/jpeg;base64,{vis_base64}"
     })
 
+@csrf_exempt
+@admission.limit("segment")
+def submit_segment_job(request):
+    """Queue an image for segmentation; poll segment_job_status with the returned id."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+
+    file = request.FILES.get("image")
+    if not file:
+        return JsonResponse({"error": "No image uploaded"}, status=400)
+    if file.size > SEGMENT_MAX_UPLOAD_BYTES:
+        return JsonResponse({"error": "Image too large"}, status=413)
+
+    user_id = None
+    token = get_auth_token(request)
+    if token:
+        decoded = decode_jwt(token)
+        if not decoded:
+            return JsonResponse({"error": "Invalid token"}, status=401)
+        user_id = str(decoded["user_id"])
+
+    try:
+        job_id = segmentation_queue.submit(file.read(), user_id=user_id)
+    except PyMongoError as exc:
+        print(f"[DEBUG] Could not queue segmentation job: {exc}")
+        return JsonResponse({"error": "Could not queue job"}, status=503)
+
+    return JsonResponse({
+        "job_id": job_id,
+        "status": "queued",
+        "poll_url": f"/api/segment_jobs/{job_id}/",
+    }, status=202)
+
+@csrf_exempt
+def segment_job_status(request, job_id):
+    if request.method != "GET":
+        return JsonResponse({"error": "Invalid request"}, status=400)
+
+    job = segmentation_queue.get(job_id)
+    if not job:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    if job.get("user_id"):
+        token = get_auth_token(request)
+        decoded = decode_jwt(token) if token else None
+        if not decoded or str(decoded["user_id"]) != job["user_id"]:
+            return JsonResponse({"error": "Job not found"}, status=404)
+
+    return FastJsonResponse(job_to_json(job))
+
 # --- Views ---
 def recommend_page(request):
     return render(request, "recommend.html")
@@ -218,15 +506,22 @@ def signup(request):
                 "Password must be at least 8 characters long and include one uppercase letter and one special character.",
             )
             return redirect("signup")
-        if users_collection.find_one({"username": username}):
+        if not user_store.is_available(username):
             messages.error(request, "Username already taken.")
             return redirect("signup")
-        password_hash = make_password(password)
-        users_collection.insert_one({
+        try:
+            password_hash = password_hasher.make(password, client_ip(request))
+        except HashingBusy:
+            messages.error(request, "Too many signups right now, please try again.")
+            return redirect("signup")
+        created = user_store.create(username, {
             "username": username,
             "password_hash": password_hash,
             "created_at": datetime.utcnow()
         })
+        if created is None:
+            messages.error(request, "Username already taken.")
+            return redirect("signup")
         messages.success(request, "Signup successful! You can log in.")
         return redirect("login")
     return render(request, "signup.html")
@@ -252,13 +547,14 @@ def signup_mongo(request):
             "error": "Password must be at least 8 characters long and include one uppercase letter and one special character."
         }, status=400)
 
-    existing_user = users_collection.find_one({
-        "$or": [{"email": email}, {"username": email}]
-    })
-    if existing_user:
+    # Cheap pre-check so taken emails don't cost a password hash; the insert below is authoritative
+    if not user_store.is_available(email):
         return JsonResponse({"error": "Email already registered."}, status=409)
 
-    password_hash = make_password(password)
+    try:
+        password_hash = password_hasher.make(password, client_ip(request))
+    except HashingBusy as exc:
+        return hashing_busy_response(exc)
     user_doc = {
         "email": email,
         "username": email,
@@ -266,9 +562,11 @@ def signup_mongo(request):
         "display_name": display_name,
         "created_at": datetime.utcnow()
     }
-    result = users_collection.insert_one(user_doc)
+    user_id = user_store.create(email, user_doc)
+    if user_id is None:
+        return JsonResponse({"error": "Email already registered."}, status=409)
 
-    token = create_jwt(result.inserted_id)
+    token = create_jwt(user_id)
 
     return JsonResponse({
         "access": token,
@@ -319,11 +617,22 @@ def login_mongo(request):
     if not email or not password:
         return JsonResponse({"error": "Email and password are required."}, status=400)
 
-    user = users_collection.find_one({
-        "$or": [{"email": email}, {"username": email}]
-    })
+    user = user_store.find(email, USER_AUTH_PROJECTION)
 
-    if not user or not check_password(password, user.get("password_hash", "")):
+    def _upgrade_hash(raw_password):
+        # Stored with an older hasher: rehash with the preferred one
+        users_collection.update_one(
+            {"_id": user["_id"]},
+            {"$set": {"password_hash": make_password(raw_password)}}
+        )
+
+    try:
+        valid = bool(user) and password_hasher.check(
+            password, user.get("password_hash", ""), client_ip(request), setter=_upgrade_hash
+        )
+    except HashingBusy as exc:
+        return hashing_busy_response(exc)
+    if not valid:
         return JsonResponse({"error": "Invalid credentials"}, status=401)
 
     token = create_jwt(user["_id"])
@@ -340,6 +649,57 @@ def login_mongo(request):
 # --- Views using custom JWT ---
 
 wardrobe_collection = users_db["wardrobe"]
+WARDROBE_BATCH_LIMIT = 100
+
+# Which outfits each user already saved, so recommend can skip them
+wardrobe_membership = WardrobeMembership(wardrobe_collection)
+
+def ensure_indexes():
+    """Create the indexes the views rely on; runs once in the background at server startup."""
+    try:
+        # One row per (user, filename): retried saves become no-ops
+        ensure_wardrobe_indexes(wardrobe_collection)
+    except PyMongoError as exc:
+        print(
+            f"[ERROR] Unique wardrobe index missing, saves are NOT idempotent: {exc}. "
+            "If existing rows are duplicated, run `python manage.py dedupe_wardrobe`."
+        )
+    try:
+        segmentation_queue.ensure_indexes()
+    except PyMongoError as exc:
+        print(f"[DEBUG] Could not create segmentation job indexes: {exc}")
+    try:
+        # Index first, so the backfill can't create duplicate login keys
+        user_store.ensure_indexes()
+        updated, conflicts = user_store.migrate_login_keys()
+        if updated or conflicts:
+            print(f"[DEBUG] Backfilled login_key on {updated} users, {len(conflicts)} conflicts")
+    except PyMongoError as exc:
+        print(f"[DEBUG] Could not prepare user login keys: {exc}")
+
+_background_lock = threading.Lock()
+_background_started = False
+
+def start_background_tasks():
+    """
+    Index setup, cache invalidation and the periodic rebuild/prune loops.
+    Started once per server process from QuizConfig.ready(), never on import,
+    so management commands don't spawn them.
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+
+    threading.Thread(target=ensure_indexes, daemon=True, name="mongo-indexes").start()
+    generated_images_cache.watch(
+        collection,
+        [{"$match": {"operationType": "insert", "fullDocument.is_ai": True}}],
+    )
+    _schedule_outfit_cache_pruning()
+    catalogue_snapshots.start()
+    slate_store.start(lambda name: read_images_db[name])
 
 def get_auth_token(request):
     """Extract the Bearer token from headers."""
@@ -370,16 +730,89 @@ def save_image(request):
     if not filename or not image_url:
         return JsonResponse({"error": "Missing data"}, status=400)
 
-    wardrobe_collection.insert_one({
-        "user_id": user_id,
-        "filename": filename,
-        "image_url": image_url,
-        "tags": tags,
-        "saved_at": datetime.utcnow()
-    })
+    try:
+        wardrobe_collection.insert_one({
+            "user_id": user_id,
+            "filename": filename,
+            "image_url": image_url,
+            "tags": tags,
+            "saved_at": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        return JsonResponse({"success": True, "duplicate": True})
+    wardrobe_membership.add(user_id, [filename, image_url])
+    # Engagement signal for weighted recommendation sampling
+    collection.update_one({"filename": filename}, {"$inc": {"save_count": 1}})
 
     return JsonResponse({"success": True})
 
+@csrf_exempt
+def save_images(request):
+    """Save a batch of wardrobe items with one insert_many; returns a status per item."""
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request"}, status=400)
+
+    token = get_auth_token(request)
+    if not token:
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    decoded = decode_jwt(token)
+    if not decoded:
+        return JsonResponse({"error": "Invalid token"}, status=401)
+
+    try:
+        payload = json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    items = payload.get("items")
+    if not isinstance(items, list) or not items:
+        return JsonResponse({"error": "Missing items"}, status=400)
+    if len(items) > WARDROBE_BATCH_LIMIT:
+        return JsonResponse({"error": f"At most {WARDROBE_BATCH_LIMIT} items per request"}, status=400)
+
+    user_id = str(decoded["user_id"])
+    results = [None] * len(items)
+    documents = []
+    positions = []
+    now = datetime.utcnow()
+    for idx, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        filename = item.get("filename")
+        image_url = item.get("image_url")
+        if not filename or not image_url:
+            results[idx] = {"filename": filename, "status": "invalid"}
+            continue
+        results[idx] = {"filename": filename, "status": "saved"}
+        documents.append({
+            "user_id": user_id,
+            "filename": filename,
+            "image_url": image_url,
+            "tags": item.get("tags", []),
+            "saved_at": now
+        })
+        positions.append(idx)
+
+    if documents:
+        try:
+            wardrobe_collection.insert_many(documents, ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                result = results[positions[error["index"]]]
+                result["status"] = "exists" if error.get("code") == 11000 else "error"
+
+    saved = [result["filename"] for result in results if result["status"] == "saved"]
+    if saved:
+        saved_names = set(saved)
+        wardrobe_membership.add(user_id, [
+            key for document in documents if document["filename"] in saved_names
+            for key in (document["filename"], document["image_url"])
+        ])
+        collection.update_many({"filename": {"$in": saved}}, {"$inc": {"save_count": 1}})
+
+    return JsonResponse({"success": True, "results": results})
+
+@compressed
 @csrf_exempt
 def get_wardrobe(request):
     if request.method != "GET":
@@ -394,17 +827,10 @@ def get_wardrobe(request):
         return JsonResponse({"error": "Invalid token"}, status=401)
 
     user_id = str(decoded["user_id"])
-    saved_items = list(wardrobe_collection.find({"user_id": user_id}))
-    wardrobe = []
-    for item in saved_items:
-        wardrobe.append({
-            "id": str(item.get("_id")),
-            "name": item.get("filename", ""),
-            "image": item.get("image_url", ""),
-            "tags": item.get("tags", [])
-        })
+    saved_items = raw(wardrobe_collection).find({"user_id": user_id}, WARDROBE_PROJECTION)
+    wardrobe = [WardrobeItem.from_doc(item).to_json() for item in saved_items]
 
-    return JsonResponse({"wardrobe": wardrobe})
+    return FastJsonResponse({"wardrobe": wardrobe})
 
 @csrf_exempt
 def delete_wardrobe_item(request):
@@ -437,15 +863,70 @@ def delete_wardrobe_item(request):
     result = wardrobe_collection.delete_one({"_id": object_id, "user_id": user_id})
     if result.deleted_count == 0:
         return JsonResponse({"error": "Wardrobe item not found"}, status=404)
+    wardrobe_membership.invalidate(user_id)
 
     return JsonResponse({"success": True})
 
+@csrf_exempt
+def delete_wardrobe_items(request):
+    """Delete a batch of wardrobe items with one delete_many; returns a status per id."""
+    if request.method != "DELETE":
+        return JsonResponse({"error": "Invalid request method"}, status=405)
+
+    token = get_auth_token(request)
+    if not token:
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    decoded = decode_jwt(token)
+    if not decoded:
+        return JsonResponse({"error": "Invalid token"}, status=401)
+
+    try:
+        payload = json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        payload = {}
+
+    item_ids = payload.get("ids") or payload.get("item_ids")
+    if not isinstance(item_ids, list) or not item_ids:
+        return JsonResponse({"error": "Missing wardrobe item ids"}, status=400)
+    if len(item_ids) > WARDROBE_BATCH_LIMIT:
+        return JsonResponse({"error": f"At most {WARDROBE_BATCH_LIMIT} ids per request"}, status=400)
+
+    object_ids = {}
+    for item_id in item_ids:
+        try:
+            object_ids[str(item_id)] = ObjectId(item_id)
+        except (InvalidId, TypeError):
+            continue
+
+    user_id = str(decoded["user_id"])
+    owned = set()
+    if object_ids:
+        query = {"_id": {"$in": list(object_ids.values())}, "user_id": user_id}
+        owned = {str(doc["_id"]) for doc in wardrobe_collection.find(query, {"_id": 1})}
+        if owned:
+            wardrobe_collection.delete_many(query)
+            wardrobe_membership.invalidate(user_id)
+
+    results = []
+    for item_id in item_ids:
+        key = str(item_id)
+        if key not in object_ids:
+            status = "invalid"
+        elif key in owned:
+            status = "deleted"
+        else:
+            status = "not_found"
+        results.append({"id": key, "status": status})
+
+    return JsonResponse({"success": True, "results": results})
+
 def generate(base_tags, image_count_per_weather=3, user_id=None):
     weather_types = ["hot", "cold"]
 
     normalized_tags = []
     for tag in base_tags or []:
-        text = str(tag).strip().lower()
+        text = canonical_tag(str(tag))
         if text and text not in normalized_tags:
             normalized_tags.append(text)
 
@@ -457,7 +938,18 @@ def generate(base_tags, image_count_per_weather=3, user_id=None):
 
     time.sleep(1)
 
+    if not genai_breakers.get(GENAI_IMAGE_MODEL).available():
+        print(f"[DEBUG] Gemini circuit open, skipping background generation for '{query}'")
+        return
+
     for weather in weather_types:
+        weather_query = f"{query} {weather}"
+        cached = cached_prompt(weather_query)
+        if cached and len(cached.images) >= image_count_per_weather:
+            print(f"[DEBUG] Reusing {len(cached.images)} cached {weather} images for '{query}'")
+            continue
+
+        generated_urls = []
         for i in range(image_count_per_weather):
             try:
                 prompt_text = (
@@ -467,10 +959,7 @@ def generate(base_tags, image_count_per_weather=3, user_id=None):
                 print(f"[DEBUG] Generating {weather} image for query '{query}', attempt {i+1}")
                 print(f"[DEBUG] Prompt text: {prompt_text}")
 
-                response = genai_client.models.generate_content(
-                    model='gemini-2.5-flash-image-preview',
-                    contents=[prompt_text],
-                )
+                response = generate_image_content(prompt_text)
 
                 # Loop through all parts to find inline images
                 for part in response.candidates[0].content.parts:
@@ -481,41 +970,47 @@ def generate(base_tags, image_count_per_weather=3, user_id=None):
                         storage_filename = f"{safe_keywords}___{weather}___{random_suffix}.png"
                         search_filename = f"GENERATED_{safe_keywords}___{weather}___{random_suffix}.png"
 
-                        # Upload to R2
-                        r2_url = upload_to_r2(storage_filename, image_bytes)
+                        extra_fields = {"search_filename": search_filename, "is_ai": True}
+
+                        # Upload to R2 (if it gets spooled, the metadata below is written after the drain)
+                        r2_url = upload_to_r2(storage_filename, image_bytes, pending={
+                            "kind": "image",
+                            "filename": storage_filename,
+                            "tags": normalized_tags,
+                            "user_id": user_id,
+                            "extra_fields": extra_fields,
+                            "wardrobe_user_id": user_id,
+                        })
                         if r2_url:
                             print(f"[DEBUG] Uploaded image to R2: {r2_url}")
+                            generated_urls.append(r2_url)
 
-                            # Save metadata in DB with the selected quiz tags
+                            # Save metadata in DB with the selected quiz tags, marked as AI-generated
                             save_image_metadata(
                                 storage_filename,
                                 normalized_tags,
                                 r2_url,
-                                user_id=user_id
+                                user_id=user_id,
+                                image_bytes=image_bytes,
+                                extra_fields=extra_fields
                             )
                             print(f"[DEBUG] Saved image metadata to DB: {storage_filename}")
 
-                            # Mark as AI-generated
-                            collection.update_one(
-                                {"filename": storage_filename},
-                                {"$set": {"search_filename": search_filename, "is_ai": True}}
-                            )
-                            print(f"[DEBUG] Marked image as AI-generated")
-
                             # Save to user's wardrobe if logged in
                             if user_id:
-                                wardrobe_collection.insert_one({
-                                    "user_id": user_id,
-                                    "filename": storage_filename,
-                                    "image_url": r2_url,
-                                    "tags": normalized_tags,
-                                    "saved_at": datetime.utcnow()
-                                })
+                                save_to_wardrobe(user_id, storage_filename, r2_url, normalized_tags)
 
+            except CircuitOpen:
+                print(f"[DEBUG] Gemini circuit open, stopping generation for '{query}'")
+                remember_prompt(weather_query, generated_urls, normalized_tags)
+                return
             except Exception as e:
                 print(f"[DEBUG] Error generating {weather} image for '{query}': {e}")
 
+        remember_prompt(weather_query, generated_urls, normalized_tags)
+
 # --- Get AI-generated Images ---
+@compressed
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @csrf_exempt
@@ -538,29 +1033,32 @@ def get_generated_images(request):
 
     print(f"[DEBUG] get_generated_images keywords: {keywords}")
 
-    # Only fetch AI-generated images
-    ai_images = list(collection.find(
+    cache_key = generated_images_cache.make_key(keywords)
+    cached = generated_images_cache.get(cache_key)
+    if cached is not None:
+        return FastJsonResponse({"outfits": cached})
+
+    # Only fetch AI-generated images. Read from the primary: the result is cached
+    # until the next invalidating write, so a lagging secondary's answer would be
+    # pinned for the whole TTL. The cache absorbs the extra primary load.
+    ai_images = catalogue_items(raw(collection).find(
         {"tags": {"$in": keywords}, "is_ai": True},
-        {"filename": 1, "tags": 1, "images": 1}
+        GENERATED_PROJECTION
     ).sort("created_at", -1).limit(TOTAL_IMAGES))
 
     print(f"[DEBUG] Found {len(ai_images)} AI-generated images in DB")
 
-    output = []
-    for doc in ai_images:
-        url = doc["images"]["full"]
-        output.append({
-            "name": doc["filename"],
-            "image": url,
-            "tags": doc.get("tags", []),
-            "source_url": url
-        })
+    output = [item.to_json() for item in ai_images]
 
-    return JsonResponse({"outfits": output})
+    generated_images_cache.set(cache_key, output)
+    return FastJsonResponse({"outfits": output})
 
+@profiled("generate_outfits")
+@compressed
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @csrf_exempt
+@admission.limit("generate")
 def generate_outfits(request):
     try:
         data = json.loads(request.body or "{}")
@@ -578,6 +1076,9 @@ def generate_outfits(request):
         image_count = 4
     image_count = max(1, min(image_count, 8))
 
+    # "url": wait for the R2 uploads and return links instead of inline base64
+    image_transport = str(data.get("image_transport") or data.get("imageTransport") or "inline").strip().lower()
+
     primary_style = (styles + ["casual"])[0]
     primary_body_shape = (body_shapes + ["womenswear"])[0]
     primary_occasion = occasions[0] if occasions else ""
@@ -588,61 +1089,112 @@ def generate_outfits(request):
     prompt_tokens = [token for token in prompt_tokens if token]
     prompt_query = " ".join(prompt_tokens) or "casual womenswear"
 
+    cached = cached_prompt(prompt_query)
+    if cached and len(cached.images) >= image_count:
+        print(f"[DEBUG] Serving '{prompt_query}' from the outfit cache")
+        outfits = []
+        for url in random.sample(cached.images, image_count):
+            storage_name = unquote(url.rsplit("/", 1)[-1])
+            outfits.append({
+                "name": f"GENERATED_{storage_name}",
+                "image": url,
+                "tags": prompt_tokens,
+                "source_url": url
+            })
+        return FastJsonResponse({"outfits": outfits})
+
+    if not genai_breakers.get(GENAI_IMAGE_MODEL).available():
+        print(f"[DEBUG] Gemini circuit open, serving catalogue images for '{prompt_query}'")
+        outfits = [item.to_json() for item in catalogue_fallback(prompt_tokens, image_count)]
+        return FastJsonResponse({"outfits": outfits, "fallback": "catalogue"})
+
     ai_images = []
+    circuit_open = False
     for idx in range(image_count):
         prompt_text = (
             f"{prompt_query} women's fashion single outfit flatlay, "
             f"high quality, white background, different accessories, variation {idx + 1}"
         )
         try:
-            response = genai_client.models.generate_content(
-                model='gemini-2.5-flash-image-preview',
-                contents=[prompt_text],
-            )
+            response = generate_image_content(prompt_text)
 
             for part in response.candidates[0].content.parts:
                 if getattr(part, 'inline_data', None):
-                    ai_images.append(part.inline_data.data)
+                    ai_images.append(ImageBuffer(part.inline_data.data))
                     break
+        except CircuitOpen:
+            circuit_open = True
+            break
         except Exception as exc:
             print(f"[DEBUG] Error generating image for '{prompt_text}': {exc}")
 
+    # Entries are dicts, or (fields, ImageBuffer) pairs streamed as data URIs;
+    # the uploader reads the very same buffer, nothing is copied per consumer
     outfits = []
-    def _store_async(bytes_payload: bytes, filename: str, tags: list[str]) -> None:
+    def _store_metadata(filename: str, tags: list[str], buffer: ImageBuffer, r2_url: str) -> None:
         try:
-            r2_url = upload_to_r2(filename, bytes_payload)
-            if r2_url:
-                save_image_metadata(filename, tags, r2_url)
+            save_image_metadata(filename, tags, r2_url, image_bytes=buffer.view)
         except Exception as exc:
             print(f"[DEBUG] Error persisting generated image '{filename}': {exc}")
 
-    for image_bytes in ai_images:
-        img_b64 = base64.b64encode(image_bytes).decode("utf-8")
+    uploads = []
+    for buffer in ai_images:
         random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
         keywords_slug = '___'.join(prompt_tokens) if prompt_tokens else 'casual_womenswear'
         storage_name = f"{keywords_slug}___ai___{random_suffix}.png"
         display_name = f"GENERATED_{storage_name}"
 
-        outfits.append({
+        upload = r2_uploader.submit(
+            storage_name,
+            buffer.view,
+            on_success=partial(_store_metadata, storage_name, prompt_tokens[:], buffer),
+            pending={"kind": "image", "filename": storage_name, "tags": prompt_tokens[:]},
+        )
+        uploads.append((display_name, upload))
+        if image_transport == "url":
+            continue
+
+        outfits.append(({
             "name": display_name,
-            "image": f"data:image/png;base64,{img_b64}",
             "tags": prompt_tokens,
             "source_url": None
-        })
+        }, buffer))
+    ai_images = None
 
+    if image_transport == "url":
+        for display_name, upload in uploads:
+            r2_url = upload.result()
+            if r2_url:
+                outfits.append({
+                    "name": display_name,
+                    "image": r2_url,
+                    "tags": prompt_tokens,
+                    "source_url": r2_url
+                })
+        remember_prompt(prompt_query, [upload for _, upload in uploads], prompt_tokens)
+    elif uploads:
         threading.Thread(
-            target=_store_async,
-            args=(image_bytes, storage_name, prompt_tokens[:]),
+            target=background_task(remember_prompt),
+            args=(prompt_query, [upload for _, upload in uploads], prompt_tokens[:]),
             daemon=True,
         ).start()
 
     random.shuffle(outfits)
-    return JsonResponse({"outfits": outfits[:image_count]})
+    extra = {}
+    if (circuit_open or not uploads) and len(outfits) < image_count:
+        # The circuit opened mid-request or every call failed: top up with catalogue images
+        outfits += [item.to_json() for item in catalogue_fallback(prompt_tokens, image_count - len(outfits))]
+        extra["fallback"] = "catalogue"
+    if any(isinstance(entry, tuple) for entry in outfits):
+        return StreamingOutfitsResponse(outfits[:image_count], extra)
+    return FastJsonResponse({"outfits": outfits[:image_count], **extra})
 
 
+@compressed
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @csrf_exempt
+@admission.limit("instant_vibe")
 def generate_instant_vibe(request):
     """Temporary helper to seed the instant outfit collection with curated vibes."""
     try:
@@ -657,108 +1209,7 @@ def generate_instant_vibe(request):
         count = 8
     count = max(1, min(count, 16))
 
-    vibe_input = str(payload.get("vibe") or "sunny").strip().lower()
-    vibe_config = {
-        "sunny": {
-            "name": "sunny",
-            "tag": "sunny",
-            "prompt": (
-                "sunny vibe, warm glow, breezy fabrics, vibrant yet wearable palette, "
-                "normal but fashionable styling"
-            ),
-            "suffix": "instant_sunny",
-        },
-        "cloudy": {
-            "name": "cloudy",
-            "tag": "cloudy",
-            "prompt": (
-                "cloudy day vibe, cozy layered styling, refined neutrals, chic and wearable, "
-                "normal proportions, elevated street style"
-            ),
-            "suffix": "instant_cloudy",
-        },
-        "cold": {
-            "name": "cold",
-            "tag": "cold",
-            "prompt": (
-                "cold weather vibe, layered outerwear, luxe knits, rich textures, "
-                "fashionable yet practical warmth, crisp and polished styling"
-            ),
-            "suffix": "instant_cold",
-        },
-        "date": {
-            "name": "date",
-            "tag": "date",
-            "prompt": (
-                "date night vibe, elevated romantic styling, flattering silhouettes, "
-                "modern glamour, wearable elegance, confident but natural"
-            ),
-            "suffix": "instant_date",
-        },
-        "work": {
-            "name": "work",
-            "tag": "work",
-            "prompt": (
-                "workday vibe, polished tailoring, sharp silhouettes, refined neutrals, "
-                "power dressing that remains wearable and modern"
-            ),
-            "suffix": "instant_work",
-        },
-        "casual": {
-            "name": "casual",
-            "tag": "casual",
-            "prompt": (
-                "casual vibe, effortless street style, relaxed yet put-together silhouette, "
-                "trend-aware layering, wearable comfort with polish"
-            ),
-            "suffix": "instant_casual",
-        },
-    }
-
-    normalized_input = vibe_input.replace("-", " ").replace("_", " ").strip()
-    alias_map = {
-        "sun": "sunny",
-        "sunny": "sunny",
-        "sunny vibe": "sunny",
-        "sunny vibes": "sunny",
-        "cloud": "cloudy",
-        "cloudy": "cloudy",
-        "cloudy vibe": "cloudy",
-        "cloudy vibes": "cloudy",
-        "overcast": "cloudy",
-        "cold": "cold",
-        "cold vibe": "cold",
-        "cold vibes": "cold",
-        "winter": "cold",
-        "winter vibe": "cold",
-        "chilly": "cold",
-        "date": "date",
-        "date night": "date",
-        "date-night": "date",
-        "romantic": "date",
-        "evening": "date",
-        "night out": "date",
-        "work": "work",
-        "work vibe": "work",
-        "office": "work",
-        "boardroom": "work",
-        "career": "work",
-        "formal": "work",
-        "casual": "casual",
-        "casual vibe": "casual",
-        "off duty": "casual",
-        "off-duty": "casual",
-        "weekend": "casual",
-        "street": "casual",
-        "street style": "casual",
-    }
-    vibe_key = alias_map.get(normalized_input)
-    if not vibe_key and " " in normalized_input:
-        vibe_key = alias_map.get(normalized_input.split(" ")[0])
-    if not vibe_key:
-        vibe_key = normalized_input or "sunny"
-
-    config = vibe_config.get(vibe_key) or vibe_config["sunny"]
+    config = get_vocabulary().resolve_vibe(payload.get("vibe") or "sunny")
     vibe = config["name"]
 
     base_prompt = (
@@ -766,16 +1217,18 @@ def generate_instant_vibe(request):
         f"{config['prompt']}, photo-real, no distortions, no awkward outfits"
     )
 
+    if not genai_breakers.get(GENAI_IMAGE_MODEL).available():
+        outfits = [item.to_json() for item in catalogue_fallback([config["tag"]], count)]
+        return FastJsonResponse({"created": [], "errors": [], "outfits": outfits, "fallback": "catalogue"})
+
     created: list[dict[str, str]] = []
     errors: list[str] = []
+    pending = []
 
     for idx in range(count):
         prompt_text = f"{base_prompt}, different variation {idx + 1}"
         try:
-            response = genai_client.models.generate_content(
-                model="gemini-2.5-flash-image-preview",
-                contents=[prompt_text],
-            )
+            response = generate_image_content(prompt_text)
 
             image_bytes = None
             for part in response.candidates[0].content.parts:
@@ -791,32 +1244,41 @@ def generate_instant_vibe(request):
                 random.choices(string.ascii_lowercase + string.digits, k=6)
             )
             filename = f"{config['suffix']}___{random_suffix}.png"
-            r2_url = upload_to_r2(filename, image_bytes)
-            if not r2_url:
-                errors.append(f"Upload failed for {filename}")
-                continue
-
-            document = {
-                "filename": filename,
-                "tags": [config["tag"]],
-                "created_at": datetime.utcnow(),
-                "images": {"full": r2_url, "thumbnail": r2_url},
-                "source_url": r2_url,
-                "collection": "instantoutfit",
-                "is_ai": True,
-                "prompt": prompt_text,
-                "seed_source": f"generate_instant_vibe::{vibe}",
-                "vibe": vibe,
-            }
-            instant_collection.insert_one(document)
-            created.append({"filename": filename, "image": r2_url, "vibe": vibe})
+            # Upload in the background while the next variation is generated
+            upload = r2_uploader.submit(filename, image_bytes, pending={
+                "kind": "instant", "filename": filename, "tag": config["tag"], "prompt": prompt_text, "vibe": vibe,
+            })
+            pending.append((filename, prompt_text, image_bytes, upload))
+        except CircuitOpen:
+            errors.append("Gemini unavailable, stopped early")
+            break
         except Exception as exc:  # pragma: no cover - seeding utility
             errors.append(str(exc))
 
+    documents = []
+    for filename, prompt_text, image_bytes, upload in pending:
+        r2_url = upload.result()
+        if not r2_url:
+            errors.append(f"Upload of {filename} did not complete, retrying in the background")
+            continue
+
+        documents.append(instant_document(filename, r2_url, image_bytes, config["tag"], prompt_text, vibe))
+        embedding_index.add(filename, r2_url, image_bytes)
+        created.append({"filename": filename, "image": r2_url, "vibe": vibe})
+
+    if documents:
+        instant_collection.insert_many(documents)
+
+    if not created and not genai_breakers.get(GENAI_IMAGE_MODEL).available():
+        outfits = [item.to_json() for item in catalogue_fallback([config["tag"]], count)]
+        return FastJsonResponse({"created": [], "errors": errors, "outfits": outfits, "fallback": "catalogue"})
+
     status_code = 200 if created else 500
-    return JsonResponse({"created": created, "errors": errors}, status=status_code)
+    return FastJsonResponse({"created": created, "errors": errors}, status=status_code)
 
 
+@profiled("recommend")
+@compressed
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @csrf_exempt
@@ -832,14 +1294,26 @@ def recommend(request):
     else:
         collection_name = None
 
-    image_collection = collection
+    image_collection = read_collection
     if collection_name:
         try:
-            image_collection = images_db[collection_name]
+            image_collection = read_images_db[collection_name]
         except Exception:
-            image_collection = collection
+            image_collection = read_collection
     should_generate = image_collection.name == collection.name
 
+    # Federated mode: {"collections": ["images", "instantoutfit"]} or {"federated": true}
+    federated_sources = {}
+    requested_sources = data.get("collections")
+    if requested_sources is None and data.get("federated"):
+        requested_sources = list(FEDERATED_SOURCES)
+    if isinstance(requested_sources, list):
+        for name in requested_sources:
+            if isinstance(name, str) and name.strip().lower() in FEDERATED_SOURCES:
+                federated_sources[name.strip().lower()] = FEDERATED_SOURCES[name.strip().lower()]
+    if federated_sources:
+        should_generate = "images" in federated_sources
+
     styles = _collect_values(data, "styles", "style")
     body_shapes = _collect_values(data, "bodyShapes", "bodyShape")
     temperature = data.get('temperature')
@@ -856,8 +1330,8 @@ def recommend(request):
         if decoded:
             user_id = str(decoded["user_id"])
 
-    style_tags = [str(k).strip().lower() for k in styles if k]
-    body_shape_tags = [str(k).strip().lower() for k in body_shapes if k]
+    style_tags = [canonical_tag(k) for k in styles]
+    body_shape_tags = [canonical_tag(k) for k in body_shapes]
 
     base_tags: list[str] = []
     for tag in style_tags + body_shape_tags:
@@ -924,9 +1398,8 @@ def recommend(request):
         weather_data = None
 
     is_custom_collection = bool(collection_name) and image_collection.name != collection.name
-    enforce_filters = should_generate or is_custom_collection
-    expanded_queries = expand_queries(base_tags) if enforce_filters else []
-    required_tags = set(base_tags) if enforce_filters else set()
+    enforce_filters = should_generate or is_custom_collection or bool(federated_sources)
+    profile = build_profile(base_tags, get_vocabulary().synonyms, preferred_weather) if enforce_filters else {}
 
     image_count = data.get('image_count', 4)
     try:
@@ -939,123 +1412,155 @@ def recommend(request):
 
     max_candidates = max(image_count * 4, 32)
 
-    query_conditions = []
-    if expanded_queries:
-        query_conditions.append({"tags": {"$in": expanded_queries}})
-    if preferred_weather:
-        query_conditions.append({"tags": preferred_weather})
-
-    if not query_conditions:
-        query_filter: dict[str, object] = {}
-    elif len(query_conditions) == 1:
-        query_filter = query_conditions[0]
-    else:
-        query_filter = {"$and": query_conditions}
+    # Any tag overlap qualifies and the profile score ranks; the weather bucket stays a hard filter
+    weather_filter: dict[str, object] = {"tags": preferred_weather} if preferred_weather else {}
+    query_filter: dict[str, object] = {"tags": {"$in": list(profile)}} if profile else weather_filter
+    if profile and weather_filter:
+        query_filter = {"$and": [query_filter, weather_filter]}
 
     seen_names = set()
     seen_images = set()
     response_images = []
     unique_exhausted = False
 
-    def append_doc(doc, allow_repeat=False):
-        filename = doc.get("filename")
-        if not filename:
-            return False
+    seen_hashes = set()
+    # Outfits already in the caller's wardrobe (cached per user, no query per request)
+    owned = wardrobe_membership.checker(user_id)
+
+    def append_doc(item, allow_repeat=False):
+        filename = item.filename
         if filename in seen_names:
             return False
-        if not allow_repeat and filename in exclude_names:
+        if not allow_repeat and (filename in exclude_names or (owned is not None and owned(item))):
             return False
-
-        url = None
-        images = doc.get("images") or {}
-        if isinstance(images, dict):
-            url = images.get("full") or images.get("thumbnail")
-        if not url:
-            url = doc.get("image")
-        if not url:
-            url = f"{PUBLIC_URL_BASE}{safe_filename(filename)}"
-
-        if not url:
+        if item.url in seen_images or (item.content_hash and item.content_hash in seen_hashes):
             return False
-
-        if url in seen_images:
+        if not allow_repeat and embedding_index.is_near_duplicate(filename, list(seen_names)):
             return False
 
-        source_url = doc.get("source_url") or url
-
-        tags = doc.get("tags") or []
-        normalized_tags = {str(tag).strip().lower() for tag in tags if isinstance(tag, str)}
-        if required_tags and not required_tags.issubset(normalized_tags):
-            return False
-
-        response_images.append({
-            "name": filename,
-            "image": url,
-            "tags": doc.get("tags", []),
-            "source_url": source_url
-        })
+        response_images.append(item.to_json())
         seen_names.add(filename)
-        seen_images.add(url)
+        seen_images.add(item.url)
+        if item.content_hash:
+            seen_hashes.add(item.content_hash)
         return len(response_images) >= image_count
 
-    for doc in image_collection.find(query_filter).sort("created_at", -1).limit(max_candidates):
+    relevance = (lambda docs: score_documents(docs, profile)) if profile else None
+    slate = None
+    if profile and not federated_sources:
+        slate = slate_store.get(image_collection.name, base_tags, preferred_weather)
+    from_slate = not federated_sources and slate is not None and slate.positions.size > 0
+    if federated_sources:
+        slate_lookup = lambda name: slate_store.get(name, base_tags, preferred_weather)
+        candidates = federated_candidates(federated_sources, query_filter, max_candidates, profile, slate_lookup)
+    elif from_slate:
+        candidates = slate.sample(max_candidates)
+    else:
+        candidates = sample_documents(image_collection, query_filter, max_candidates, relevance=relevance)
+    for doc in candidates:
         if append_doc(doc):
             break
 
-    if len(response_images) < image_count:
-        fallback_conditions = [
-            {"filename": {"$nin": list(seen_names.union(exclude_names))}}
-        ]
-        if preferred_weather:
-            fallback_conditions.append({"tags": preferred_weather})
-        if len(fallback_conditions) == 1:
-            fallback_filter = fallback_conditions[0]
-        else:
-            fallback_filter = {"$and": fallback_conditions}
-        for doc in image_collection.find(fallback_filter).sort("created_at", -1).limit(max_candidates):
+    if len(response_images) < image_count and from_slate:
+        # Slate used up for this caller (excluded or already saved): a miss, query live
+        live = sample_documents(image_collection, query_filter, max_candidates, relevance=relevance)
+        candidates = candidates + live
+        for doc in live:
+            if append_doc(doc):
+                break
+
+    if len(response_images) < image_count and query_filter != weather_filter:
+        # Nothing relevant left: fill with other outfits for the same weather before repeating
+        fallback = sample_documents(image_collection, weather_filter, max_candidates)
+        candidates = candidates + fallback
+        for doc in fallback:
             if append_doc(doc):
                 break
 
     if len(response_images) < image_count:
         unique_exhausted = True
-        repeat_conditions = []
-        if expanded_queries:
-            repeat_conditions.append({"tags": {"$in": expanded_queries}})
-        if preferred_weather:
-            repeat_conditions.append({"tags": preferred_weather})
-
-        if not repeat_conditions:
-            repeat_query: dict[str, object] = {}
-        elif len(repeat_conditions) == 1:
-            repeat_query = repeat_conditions[0]
-        else:
-            repeat_query = {"$and": repeat_conditions}
-        for doc in image_collection.find(repeat_query).sort("created_at", -1).limit(max_candidates):
+        for doc in candidates:
             if append_doc(doc, allow_repeat=True):
-                if len(response_images) >= image_count:
-                    break
-        if len(response_images) < image_count:
-            for doc in image_collection.find({}).sort("created_at", -1).limit(max_candidates):
-                if append_doc(doc, allow_repeat=True):
-                    if len(response_images) >= image_count:
-                        break
+                break
 
     random.shuffle(response_images)
 
     if base_tags and should_generate:
-        threading.Thread(
-            target=generate,
-            args=(base_tags, min(image_count, 2), user_id),
-            daemon=True
-        ).start()
+        # Background generation is the first work shed when the server is loaded
+        if not admission.run_background(background_task(generate), base_tags, min(image_count, 2), user_id):
+            print("[DEBUG] Shedding background generation under load")
 
-    return JsonResponse({
+    return FastJsonResponse({
         "outfits": response_images[:image_count],
         "uniqueExhausted": unique_exhausted,
         "weather": weather_info,
     })
 
 
+@compressed
+@csrf_exempt
+def similar_outfits(request):
+    """More-like-this: outfits visually closest to a catalogue image or wardrobe item."""
+    if request.method != "GET":
+        return JsonResponse({"error": "Invalid request"}, status=400)
+
+    try:
+        count = int(request.GET.get("count", 8))
+    except (TypeError, ValueError):
+        count = 8
+    count = max(1, min(count, TOTAL_IMAGES))
+
+    filename = (request.GET.get("filename") or "").strip()
+    image_url = None
+    item_id = request.GET.get("id") or request.GET.get("item_id")
+    if item_id:
+        token = get_auth_token(request)
+        if not token:
+            return JsonResponse({"error": "Unauthorized"}, status=401)
+
+        decoded = decode_jwt(token)
+        if not decoded:
+            return JsonResponse({"error": "Invalid token"}, status=401)
+
+        try:
+            object_id = ObjectId(item_id)
+        except (InvalidId, TypeError):
+            return JsonResponse({"error": "Invalid wardrobe item id"}, status=400)
+
+        item = wardrobe_collection.find_one(
+            {"_id": object_id, "user_id": str(decoded["user_id"])},
+            {"filename": 1, "image_url": 1}
+        )
+        if not item:
+            return JsonResponse({"error": "Wardrobe item not found"}, status=404)
+        filename = item.get("filename") or ""
+        image_url = item.get("image_url")
+
+    if not filename:
+        return JsonResponse({"error": "Missing filename or wardrobe item id"}, status=400)
+
+    query = embedding_index.vector(filename)
+    if query is None and image_url:
+        # Saved before indexing existed: embed it once and keep it (only images we host)
+        image_bytes = fetch_public_image(image_url)
+        if image_bytes and embedding_index.add(filename, image_url, image_bytes):
+            query = embedding_index.vector(filename)
+    if query is None:
+        return JsonResponse({"error": "No embedding available for this item"}, status=404)
+
+    outfits = []
+    for match in embedding_index.search(query, k=count, exclude={filename}):
+        url = match.get("url") or f"{PUBLIC_URL_BASE}{safe_filename(match['filename'])}"
+        outfits.append({
+            "name": match["filename"],
+            "image": url,
+            "source_url": url,
+            "score": round(match["score"], 4),
+        })
+
+    return FastJsonResponse({"outfits": outfits})
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def weather_status(request):
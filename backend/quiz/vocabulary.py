@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping
+
+# --- Tag vocabulary: synonyms, tag aliases and instant-vibe aliases ---
+# Loaded once from vocabulary.json into immutable lookup tables and reloaded
+# when the file changes, so ops can edit it without a deploy.
+VOCABULARY_PATH = os.getenv(
+    "VOCABULARY_PATH", os.path.join(os.path.dirname(__file__), "vocabulary.json")
+)
+RELOAD_CHECK_SECONDS = 5.0
+
+
+@dataclass(frozen=True)
+class Vocabulary:
+    synonyms: Mapping[str, tuple[str, ...]]
+    tag_aliases: Mapping[str, str]
+    vibes: Mapping[str, Mapping[str, str]]
+    vibe_aliases: Mapping[str, str]
+    default_vibe: str
+
+    def resolve_vibe(self, text) -> Mapping[str, str]:
+        """Map free-form vibe input ("date-night", "Winter vibe", ...) to its vibe config."""
+        normalized = normalize_text(str(text or "").replace("-", " ").replace("_", " "))
+        key = self.vibe_aliases.get(normalized)
+        if not key and " " in normalized:
+            key = self.vibe_aliases.get(normalized.split(" ")[0])
+        if not key:
+            key = normalized or self.default_vibe
+        return self.vibes.get(key) or self.vibes[self.default_vibe]
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _freeze(data: dict) -> Vocabulary:
+    synonyms = {
+        normalize_text(tag): tuple(normalize_text(item) for item in items)
+        for tag, items in (data.get("synonyms") or {}).items()
+    }
+    tag_aliases = {normalize_text(alias): normalize_text(tag) for alias, tag in (data.get("tag_aliases") or {}).items()}
+    vibes = {key: MappingProxyType(dict(config)) for key, config in (data.get("vibes") or {}).items()}
+    vibe_aliases = {normalize_text(alias): key for alias, key in (data.get("vibe_aliases") or {}).items()}
+    for key in vibes:
+        vibe_aliases.setdefault(key, key)
+    return Vocabulary(
+        synonyms=MappingProxyType(synonyms),
+        tag_aliases=MappingProxyType(tag_aliases),
+        vibes=MappingProxyType(vibes),
+        vibe_aliases=MappingProxyType(vibe_aliases),
+        default_vibe=data.get("default_vibe") or next(iter(vibes)),
+    )
+
+
+def load_vocabulary(path: str = VOCABULARY_PATH) -> Vocabulary:
+    with open(path, "r", encoding="utf-8") as fh:
+        return _freeze(json.load(fh))
+
+
+_lock = threading.Lock()
+_current = load_vocabulary()
+_loaded_mtime = os.path.getmtime(VOCABULARY_PATH)
+_next_check = time.monotonic() + RELOAD_CHECK_SECONDS
+
+
+def get_vocabulary() -> Vocabulary:
+    """Current vocabulary; re-reads the data file at most every few seconds if it changed."""
+    global _current, _loaded_mtime, _next_check
+    now = time.monotonic()
+    if now < _next_check:
+        return _current
+    with _lock:
+        if now < _next_check:
+            return _current
+        _next_check = now + RELOAD_CHECK_SECONDS
+        try:
+            mtime = os.path.getmtime(VOCABULARY_PATH)
+            if mtime != _loaded_mtime:
+                _current = load_vocabulary()
+                _loaded_mtime = mtime
+                canonical_tag.cache_clear()
+                _expand.cache_clear()
+                print(f"[DEBUG] Reloaded vocabulary from {VOCABULARY_PATH}")
+        except (OSError, ValueError) as exc:
+            print(f"[DEBUG] Keeping previous vocabulary, reload failed: {exc}")
+    return _current
+
+
+@lru_cache(maxsize=4096)
+def canonical_tag(text: str) -> str:
+    """Lowercase, collapse whitespace and apply tag aliases."""
+    normalized = normalize_text(text)
+    return _current.tag_aliases.get(normalized, normalized)
+
+
+@lru_cache(maxsize=2048)
+def _expand(tags: tuple[str, ...]) -> tuple[str, ...]:
+    expanded = set(tags)
+    for tag in tags:
+        expanded.update(_current.synonyms.get(tag, ()))
+    return tuple(expanded)
+
+
+def expand_tags(tags) -> tuple[str, ...]:
+    """Tags plus their synonyms, memoized on the canonical, order-independent tag set."""
+    get_vocabulary()
+    return _expand(tuple(sorted({canonical_tag(str(tag)) for tag in tags if tag})))
@@ -0,0 +1,42 @@
+# --- Wardrobe uniqueness ---
+# save_image / save_images rely on a unique (user_id, filename) index to make
+# retried saves no-ops. Rows saved before the index existed may already be
+# duplicated, and Mongo refuses to build a unique index over them. Startup
+# only tries create_index; removing duplicates (all but the oldest row of each
+# group) deletes user data, so an operator runs it: `manage.py dedupe_wardrobe`.
+WARDROBE_UNIQUE_INDEX = "user_filename_unique"
+WARDROBE_DEDUPE_BATCH = 1000
+
+
+def remove_duplicate_rows(collection, batch_size: int = WARDROBE_DEDUPE_BATCH, dry_run: bool = False) -> int:
+    """
+    Delete all but the first-saved row per (user_id, filename); returns how many
+    rows were (or, with `dry_run`, would be) removed.
+    """
+    duplicates = collection.aggregate([
+        {"$group": {
+            "_id": {"user_id": "$user_id", "filename": "$filename"},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+
+    removed = 0
+    batch = []
+    for group in duplicates:
+        batch += sorted(group["ids"])[1:]  # ObjectIds sort by creation time
+        if dry_run:
+            removed += len(batch)
+            batch = []
+        elif len(batch) >= batch_size:
+            removed += collection.delete_many({"_id": {"$in": batch}}).deleted_count
+            batch = []
+    if batch:
+        removed += collection.delete_many({"_id": {"$in": batch}}).deleted_count
+    return removed
+
+
+def ensure_wardrobe_indexes(collection) -> None:
+    """Build the unique index; raises OperationFailure while duplicate rows exist."""
+    collection.create_index([("user_id", 1), ("filename", 1)], unique=True, name=WARDROBE_UNIQUE_INDEX)
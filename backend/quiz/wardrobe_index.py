@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from pymongo.errors import PyMongoError
+
+from .result_cache import SHARED_CACHE_ALIAS
+
+# --- Per-user wardrobe membership ---
+# recommend skips outfits the caller already saved. Each user's wardrobe
+# filenames and image URLs are kept as a sorted array of 64-bit hashes
+# (8 bytes per key, vectorised lookups via searchsorted), loaded once per TTL
+# and updated in place by the save/delete endpoints. With a "shared" cache a
+# per-user version counter lets writes in one worker invalidate the others.
+WARDROBE_MEMBERSHIP_MAX_USERS = 4096
+WARDROBE_MEMBERSHIP_TTL = 300
+
+_EMPTY = np.zeros(0, dtype=np.uint64)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def hash_keys(keys) -> np.ndarray:
+    return np.unique(np.fromiter((_hash(key) for key in keys if key), dtype=np.uint64))
+
+
+def _contains(hashes: np.ndarray, key: str) -> bool:
+    if not key:
+        return False
+    value = np.uint64(_hash(key))
+    position = int(np.searchsorted(hashes, value))
+    return position < hashes.size and hashes[position] == value
+
+
+class WardrobeMembership:
+    def __init__(self, collection, max_users: int = WARDROBE_MEMBERSHIP_MAX_USERS, ttl: int = WARDROBE_MEMBERSHIP_TTL):
+        self.collection = collection
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, int, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+        try:
+            self._shared = caches[SHARED_CACHE_ALIAS]
+        except InvalidCacheBackendError:
+            self._shared = None
+
+    def _version_key(self, user_id: str) -> str:
+        return f"wardrobe_membership:{user_id}:version"
+
+    def _version(self, user_id: str) -> int:
+        if self._shared is None:
+            return 0
+        try:
+            return int(self._shared.get(self._version_key(user_id), 0))
+        except Exception:
+            return 0
+
+    def _bump(self, user_id: str) -> int:
+        if self._shared is None:
+            return 0
+        key = self._version_key(user_id)
+        try:
+            self._shared.add(key, 0, timeout=None)
+            return int(self._shared.incr(key))
+        except Exception:
+            return 0
+
+    def _store(self, user_id: str, version: int, hashes: np.ndarray) -> None:
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, version, hashes)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def hashes(self, user_id: str) -> np.ndarray:
+        """Sorted key hashes of the user's wardrobe; one Mongo query per user per TTL at most."""
+        version = self._version(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic() and entry[1] == version:
+                self._entries.move_to_end(user_id)
+                return entry[2]
+
+        try:
+            docs = self.collection.find({"user_id": user_id}, {"_id": 0, "filename": 1, "image_url": 1})
+            keys = [key for doc in docs for key in (doc.get("filename"), doc.get("image_url"))]
+        except PyMongoError as exc:
+            print(f"[DEBUG] Could not load wardrobe membership for {user_id}: {exc}")
+            return _EMPTY
+        hashes = hash_keys(keys)
+        self._store(user_id, version, hashes)
+        return hashes
+
+    def checker(self, user_id: str | None):
+        """`owned(item)` for a CatalogueItem, or None when there is nothing to filter."""
+        if not user_id:
+            return None
+        hashes = self.hashes(user_id)
+        if not hashes.size:
+            return None
+        return lambda item: _contains(hashes, item.filename) or _contains(hashes, item.url)
+
+    def add(self, user_id: str, keys) -> None:
+        """Record saved filenames / URLs; a user not cached here is simply loaded fresh next time."""
+        version = self._bump(user_id)
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+        # Merge only if no other worker wrote in between; otherwise reload next time
+        if entry is not None and entry[1] == (version - 1 if self._shared is not None else 0):
+            self._store(user_id, version, np.union1d(entry[2], hash_keys(keys)))
+
+    def invalidate(self, user_id: str) -> None:
+        self._bump(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)